@@ -1,16 +1,26 @@
 import asyncio
+import functools
+import html
 import logging
 import re
-from typing import List, Dict, Tuple
+import time
+from typing import Dict, Tuple
 
-import requests
+import aiohttp
 import telebot
-from bs4 import BeautifulSoup
 from notion_client import APIResponseError
-from telebot.async_telebot import AsyncTeleBot
 
-from NotionItem import NotionItem
+from CircuitBreaker import CircuitBreaker
+from LinkPreview import LinkPreviewResolver
+from MediaTransfer import MediaTransfer
+from MessageQueue import MessageQueue
+import QuickAdd
+from NotionItem import MaterialSchema, NotionItem
 from NotionWorkNote import NotionWorkNote, NotionWorkNoteItem
+from OrderedTeleBot import OrderedTeleBot
+from Profiler import Profiler
+from SearchIndex import SearchIndex
+from Supervisor import Supervisor
 
 
 class Bot:
@@ -25,23 +35,21 @@ class Bot:
         'add_work_urg_imp': 'Срочная важная',
         'add_work_urg_unimp': 'Срочная неважная',
         'add_work_unurg_imp': 'Несрочная важная',
-        'add_work_unurg_unimp': 'Несрочная неважная'
+        'add_work_unurg_unimp': 'Несрочная неважная',
+        'search': 'поиск по сохранённым материалам',
+        'profile': 'профилирование бота',
+        'tasks': 'открытые задачи',
+        'wn': 'быстро добавить задачу одним сообщением'
     }
     """список команд бота"""
 
-    userStep = {}
-    """текущее состояние пользователя при выполнении команды"""
+    userStep: Dict[int, int]
+    """текущее состояние пользователя при выполнении команды (нет записи - диалог не начат)"""
 
     start_buttons = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True)
     """начальные кнопки"""
     start_buttons.add(commands['help'], commands['add'], commands['add_work_urg_imp'], commands['add_work_urg_unimp'], commands['add_work_unurg_imp'],
-                      commands['add_work_unurg_unimp'])
-
-    category_buttons = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True)
-    """кнопки выбора категории"""
-
-    content_type_buttons = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True)
-    """кнопки выбора типа контента"""
+                      commands['add_work_unurg_unimp'], commands['tasks'])
 
     hideBoard = telebot.types.ReplyKeyboardRemove()
     """удалить кнопки из клавиатуры"""
@@ -71,56 +79,321 @@ class Bot:
                    '/add_work_urg_imp - добавить срочную важную задачу\n' \
                    '/add_work_urg_unimp - добавить срочную неважную задачу\n' \
                    '/add_work_unurg_imp - добавить несрочную важную задачу\n' \
-                   '/add_work_unurg_unimp - добавить несрочную неважную задачу\n'
+                   '/add_work_unurg_unimp - добавить несрочную неважную задачу\n' \
+                   '/search <запрос> - поиск по сохранённым материалам\n' \
+                   '/tasks - открытые задачи по квадрантам\n' \
+                   '/profile [секунды] - профилирование бота (для администратора)\n\n' \
+                   'Быстрое добавление одним сообщением (также работает в инлайн-режиме: @бот add ... / @бот wn ...):\n' \
+                   f'{QuickAdd.material_format}\n' \
+                   f'{QuickAdd.work_note_format}\n'
     """сообщение команды /help"""
 
-    notionItem: Dict[int, NotionItem] = {}
+    notionItem: Dict[int, NotionItem]
     """ОБъект NotionItem для каждого пользователя"""
 
-    notion_work_note_item: Dict[int, NotionWorkNoteItem] = {}
+    notion_work_note_item: Dict[int, NotionWorkNoteItem]
 
-    content_types: List[str] = []
-    """список типов контента"""
+    schemas: Dict[int, MaterialSchema]
+    """снимок схемы таблицы (типы контента и категории), с которым пользователь начал диалог"""
 
-    categories: List[str] = []
-    """список категорий"""
+    bot: OrderedTeleBot
+    """бот (обновления одного чата обрабатываются по очереди, разных чатов - параллельно)"""
 
-    bot: AsyncTeleBot
-    """бот"""
+    outgoing: MessageQueue
+    """очередь исходящих сообщений с учётом лимитов Telegram"""
 
     notion_work_note_client: NotionWorkNote
     """клиент для работы с рабочими заметками Notion"""
 
+    search_index: SearchIndex
+    """локальный поисковый индекс таблицы материалов"""
+
+    search_queries: Dict[int, str]
+    """последний поисковый запрос для каждого пользователя (для переключения страниц)"""
+
+    search_page_size: int = 5
+    """количество результатов поиска на странице"""
+
+    search_sync_interval: float = 5 * 60
+    """период инкрементальной синхронизации поискового индекса (секунды)"""
+
+    search_full_sync_interval: float = 24 * 60 * 60
+    """период полной синхронизации поискового индекса (секунды)"""
+
+    tasks_page_size: int = 20
+    """количество задач квадранта на странице (кнопки завершения)"""
+
+    tasks_refresh_interval: float = 10 * 60
+    """период фонового обновления кэша задач (секунды)"""
+
+    enrichment_budget_ms: int
+    """сколько ждать пересказ YandexGPT, прежде чем продолжить без него (мс)"""
+
+    yandex_endpoint: str = 'https://300.ya.ru/api/sharing-url'
+    """адрес API пересказа YandexGPT"""
+
+    yandex_timeout: float = 30
+    """таймаут запросов к YandexGPT (секунды)"""
+
+    yandex_breaker: CircuitBreaker
+    """предохранитель для YandexGPT"""
+
+    link_preview: LinkPreviewResolver
+    """получение названий страниц по ссылкам"""
+
+    _http_session: aiohttp.ClientSession | None
+    """HTTP сессия для запросов к YandexGPT"""
+
+    profiler: Profiler
+    """профилирование по запросу администратора (вне окна профилирования ничего не делает)"""
+
+    profile_default_seconds: int = 10
+    """длительность профилирования по умолчанию (секунды)"""
+
+    profile_max_seconds: int = 300
+    """максимальная длительность профилирования (секунды)"""
+
+    _profile_task: asyncio.Task | None
+    """выполняющееся профилирование"""
+
+    _background_tasks: set
+    """фоновые задачи, запущенные обработчиками (ссылки нужны, чтобы задачи не были собраны сборщиком мусора)"""
+
+    media_transfer: MediaTransfer
+    """потоковая передача вложений из Telegram в хранилище"""
+
+    _notion_token: str
+    """токен для доступа к Notion"""
+
+    _database_id: str
+    """ID таблицы Notion"""
+
     def __init__(self, telegram_token: str, notion_token: str, database_id: str, admin_username: str, yandex_token: str,
-                 notion_work_note_client: NotionWorkNote):
+                 notion_work_note_client: NotionWorkNote, search_index: SearchIndex, enrichment_budget_ms: int = 1500,
+                 max_concurrent_updates: int = 100):
         """
         Создать бота
         :param telegram_token: токен telegram бота
         :param notion_token: токен для доступа к Notion
         :param database_id: ID таблицы Notion
+        :param search_index: локальный поисковый индекс таблицы материалов
+        :param enrichment_budget_ms: сколько ждать пересказ YandexGPT перед продолжением диалога (мс)
+        :param max_concurrent_updates: сколько обновлений разных чатов обрабатывается одновременно
         """
         # telebot.apihelper.ENABLE_MIDDLEWARE = True
-        self.bot = AsyncTeleBot(token=telegram_token)
+        self.bot = OrderedTeleBot(telegram_token, max_concurrency=max_concurrent_updates)
+        self.outgoing = MessageQueue(self.bot)
         # self.bot.setup_middleware(AlbumMiddleware(1))
 
         self.notion_work_note_client = notion_work_note_client
+        self.search_index = search_index
+        self.media_transfer = MediaTransfer(telegram_token)
+        self._notion_token = notion_token
+        self._database_id = database_id
+        # ID бота - часть токена до двоеточия
+        bot_id = telegram_token.split(':')[0]
+        self.enrichment_budget_ms = enrichment_budget_ms
+        self.yandex_breaker = CircuitBreaker()
+        self.link_preview = LinkPreviewResolver()
+        self._http_session = None
+        self._background_tasks = set()
+        self.profiler = Profiler()
+        self._profile_task = None
+        self.userStep = {}
+        self.notionItem = {}
+        self.notion_work_note_item = {}
+        self.schemas = {}
+        self.search_queries = {}
 
         # Должно быть самым первым, так как отменяет все процессы при запросе
         @self.bot.message_handler(func=lambda message: message.text == self.cancel_buttons_text)
         async def send_cancel(message: telebot.types.Message):
-            self.userStep[message.chat.id] = 0
-            await self.bot.send_message(message.chat.id, "Текущая операция отменена", reply_markup=self.start_buttons)
+            _reset_chat(message.chat.id)
+            self.outgoing.send_message(message.chat.id, "Текущая операция отменена", reply_markup=self.start_buttons)
 
         # /start handler
         @self.bot.message_handler(commands=['start'])
         async def send_start(message: telebot.types.Message):
-            self.userStep[message.chat.id] = 0
-            await self.bot.send_message(message.chat.id, self.start_message, reply_markup=self.start_buttons)
+            _reset_chat(message.chat.id)
+            self.outgoing.send_message(message.chat.id, self.start_message, reply_markup=self.start_buttons)
 
         @self.bot.message_handler(func=lambda message: message.text == self.commands['help'] or message.text == '/help')
         async def send_help(message: telebot.types.Message):
-            self.userStep[message.chat.id] = 0
-            await self.bot.send_message(message.chat.id, self.help_message, reply_markup=self.start_buttons)
+            _reset_chat(message.chat.id)
+            self.outgoing.send_message(message.chat.id, self.help_message, reply_markup=self.start_buttons)
+
+        @self.bot.message_handler(commands=['search'], func=lambda message: message.from_user.username == admin_username)
+        async def send_search(message: telebot.types.Message):
+            _reset_chat(message.chat.id)
+            query = telebot.util.extract_arguments(message.text)
+
+            if not query:
+                self.outgoing.send_message(message.chat.id, "Введите запрос после команды, например: /search asyncio", reply_markup=self.start_buttons)
+                return
+
+            self.search_queries[message.chat.id] = query
+            text, markup = await _render_search_page(query, 0)
+            self.outgoing.send_message(message.chat.id, text, parse_mode='HTML', reply_markup=markup, disable_web_page_preview=True)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith('search:'))
+        async def send_search_page(call: telebot.types.CallbackQuery):
+            query = self.search_queries.get(call.message.chat.id)
+            if query is None:
+                await self.bot.answer_callback_query(call.id, "Запрос устарел, повторите поиск")
+                return
+
+            text, markup = await _render_search_page(query, int(call.data.split(':')[1]))
+            self.outgoing.edit_message_text(text, call.message.chat.id, call.message.message_id, parse_mode='HTML', reply_markup=markup,
+                                            disable_web_page_preview=True)
+            await self.bot.answer_callback_query(call.id)
+
+        # состояние диалога не сбрасывается: профилировать можно посреди добавления материала
+        @self.bot.message_handler(commands=['profile'], func=lambda message: message.from_user.username == admin_username)
+        async def send_profile(message: telebot.types.Message):
+            argument = telebot.util.extract_arguments(message.text)
+
+            if argument and not argument.isdigit():
+                self.outgoing.send_message(message.chat.id, f"Укажите длительность в секундах, например: /profile {self.profile_default_seconds}")
+                return
+
+            if self._profile_task is not None and not self._profile_task.done():
+                self.outgoing.send_message(message.chat.id, "Профилирование уже запущено")
+                return
+
+            seconds = min(max(int(argument or self.profile_default_seconds), 1), self.profile_max_seconds)
+            self._profile_task = asyncio.create_task(_send_profile_later(message.chat.id, seconds))
+            self.outgoing.send_message(message.chat.id, f"Профилирование запущено на {seconds} с, результат придёт файлом")
+
+        async def _send_profile_later(chat_id: int, seconds: int) -> None:
+            """
+            Профилирует бота и отправляет архив с результатами
+            :param chat_id: ID чата администратора
+            :param seconds: длительность профилирования (секунды)
+            :return: None
+            """
+            try:
+                archive = await self.profiler.profile(seconds)
+            except Exception as e:
+                logging.log(logging.ERROR, f'Ошибка профилирования: {e}')
+                self.outgoing.send_message(chat_id, "Ошибка профилирования")
+                return
+
+            file_name = f'profile_{time.strftime("%Y%m%d_%H%M%S")}.zip'
+            caption = 'profile.folded - свёрнутые стеки для flamegraph.pl или speedscope.app, report.txt - задержка event loop, ' \
+                      'самые частые функции и медленные корутины'
+            self.outgoing.submit(chat_id, lambda: self.bot.send_document(chat_id, archive, visible_file_name=file_name, caption=caption))
+
+        @self.bot.message_handler(func=lambda message: (message.text == self.commands['tasks'] or (message.text or '').split(' ')[0] == '/tasks')
+                                  and message.from_user.username == admin_username)
+        async def send_tasks(message: telebot.types.Message):
+            _reset_chat(message.chat.id)
+            quadrant = telebot.util.extract_arguments(message.text) if message.text.startswith('/') else ''
+
+            try:
+                if quadrant in self.notion_work_note_client.quadrants:
+                    text, markup = await _render_tasks_quadrant(quadrant)
+                else:
+                    text, markup = await _render_tasks_overview()
+            except APIResponseError as e:
+                logging.log(logging.ERROR, e)
+                self.outgoing.send_message(message.chat.id, "Ошибка получения задач из Notion", reply_markup=self.start_buttons)
+                return
+
+            self.outgoing.send_message(message.chat.id, text, reply_markup=markup)
+
+        @self.bot.callback_query_handler(func=lambda call: (call.data.startswith('tasks:') or call.data.startswith('done:'))
+                                         and call.from_user.username == admin_username)
+        async def send_tasks_page(call: telebot.types.CallbackQuery):
+            # tasks:<квадрант>[:<смещение>] или done:<квадрант>:<ID страницы>[:<смещение>]
+            action, quadrant, *args = call.data.split(':')
+            page_id = args.pop(0) if action == 'done' else None
+            offset = int(args[0]) if args else 0
+
+            try:
+                if action == 'done':
+                    await self.notion_work_note_client.complete_task(page_id)
+                if quadrant:
+                    text, markup = await _render_tasks_quadrant(quadrant, offset)
+                else:
+                    text, markup = await _render_tasks_overview()
+            except APIResponseError as e:
+                logging.log(logging.ERROR, e)
+                await self.bot.answer_callback_query(call.id, "Ошибка обращения к Notion")
+                return
+
+            self.outgoing.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+            await self.bot.answer_callback_query(call.id, "Задача выполнена" if action == 'done' else None)
+
+        @self.bot.message_handler(func=lambda message: (message.text or '').startswith('/add ') and message.from_user.username == admin_username)
+        async def send_quick_add(message: telebot.types.Message):
+            _reset_chat(message.chat.id)
+
+            try:
+                item = await _parse_quick_add(telebot.util.extract_arguments(message.text))
+            except ValueError as e:
+                self.outgoing.send_message(message.chat.id, str(e), reply_markup=self.start_buttons)
+                return
+
+            await _save_notion_item(message.chat.id, item)
+
+        @self.bot.message_handler(func=lambda message: (message.text or message.caption or '').split(' ')[0].split('\n')[0] == '/wn',
+                                  content_types=['text', 'photo'])
+        async def send_quick_work_note(message: telebot.types.Message):
+            _reset_chat(message.chat.id)
+            text = message.text if message.text else message.caption
+
+            try:
+                item = QuickAdd.parse_work_note(text[len('/wn'):])
+            except ValueError as e:
+                self.outgoing.send_message(message.chat.id, str(e), reply_markup=self.start_buttons)
+                return
+
+            if message.photo is not None:
+                file_info = await self.bot.get_file(message.photo[-1].file_id)
+                item.images = [await self.media_transfer.download(file_info.file_path)]
+
+            await _save_work_note_item(message.chat.id, item)
+
+        @self.bot.inline_handler(func=lambda query: query.from_user.username == admin_username)
+        async def send_quick_add_preview(query: telebot.types.InlineQuery):
+            kind, _, text = query.query.lstrip('/').partition(' ')
+
+            try:
+                if kind == 'add':
+                    item = await _parse_quick_add(text)
+                    title = f'Сохранить материал: {item.name}'
+                    description = f'{item.content_type} · {item.category}' + (f' · {item.url}' if item.url else '')
+                elif kind == 'wn':
+                    work_note = QuickAdd.parse_work_note(text)
+                    title = f'Сохранить задачу: {work_note.name}'
+                    description = self.commands['add_work_' + self.notion_work_note_client.get_quadrant(work_note.is_urgent, work_note.is_important)]
+                else:
+                    raise ValueError(f'{QuickAdd.material_format}\n{QuickAdd.work_note_format}')
+            except ValueError as e:
+                button = telebot.types.InlineQueryResultsButton(str(e).split('\n')[0][:64], start_parameter='help')
+                await self.bot.answer_inline_query(query.id, [], cache_time=0, is_personal=True, button=button)
+                return
+
+            result = telebot.types.InlineQueryResultArticle(
+                id=kind,
+                title=title,
+                description=description,
+                input_message_content=telebot.types.InputTextMessageContent(title)
+            )
+            await self.bot.answer_inline_query(query.id, [result], cache_time=0, is_personal=True)
+
+        # требует включённого inline feedback у бота (/setinlinefeedback в BotFather)
+        @self.bot.chosen_inline_handler(func=lambda result: result.from_user.username == admin_username)
+        async def send_quick_add_chosen(result: telebot.types.ChosenInlineResult):
+            kind, _, text = result.query.lstrip('/').partition(' ')
+
+            try:
+                if kind == 'add':
+                    await _save_notion_item(result.from_user.id, await _parse_quick_add(text))
+                elif kind == 'wn':
+                    await _save_work_note_item(result.from_user.id, QuickAdd.parse_work_note(text))
+            except ValueError as e:
+                self.outgoing.send_message(result.from_user.id, str(e), reply_markup=self.start_buttons)
 
         @self.bot.message_handler(func=lambda message: (message.text == self.commands[
             'add'] or message.text == '/add') and message.from_user.username == admin_username)
@@ -130,43 +403,44 @@ class Bot:
 
             await _get_variants(message.chat.id)
 
-            await self.bot.send_message(message.chat.id, "Введите ссылку на материал (или нажмите Пропустить)", reply_markup=self.skip_cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите ссылку на материал (или нажмите Пропустить)", coalesce_key='prompt', reply_markup=self.skip_cancel_buttons)
 
         @self.bot.message_handler(func=lambda message: message.text == self.commands['add_work_urg_imp'] or message.text == '/add_work_urg_imp')
         async def send_add_work_urgent_important(message: telebot.types.Message):
             self.userStep[message.chat.id] = 20
-            await self.bot.send_message(message.chat.id, "Введите заголовок задачи", reply_markup=self.cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите заголовок задачи", coalesce_key='prompt', reply_markup=self.cancel_buttons)
 
         @self.bot.message_handler(func=lambda message: message.text == self.commands['add_work_urg_unimp'] or message.text == '/add_work_urg_unimp')
         async def send_add_work_urgent_unimportant(message: telebot.types.Message):
             self.userStep[message.chat.id] = 21
-            await self.bot.send_message(message.chat.id, "Введите заголовок задачи", reply_markup=self.cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите заголовок задачи", coalesce_key='prompt', reply_markup=self.cancel_buttons)
 
         @self.bot.message_handler(func=lambda message: message.text == self.commands['add_work_unurg_imp'] or message.text == '/add_work_unurg_imp')
         async def send_add_work_unurgent_important(message: telebot.types.Message):
             self.userStep[message.chat.id] = 22
-            await self.bot.send_message(message.chat.id, "Введите заголовок задачи", reply_markup=self.cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите заголовок задачи", coalesce_key='prompt', reply_markup=self.cancel_buttons)
 
         @self.bot.message_handler(func=lambda message: message.text == self.commands['add_work_unurg_unimp'] or message.text == '/add_work_unurg_unimp')
         async def send_add_work_unurgent_unimportant(message: telebot.types.Message):
             self.userStep[message.chat.id] = 23
-            await self.bot.send_message(message.chat.id, "Введите заголовок задачи", reply_markup=self.cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите заголовок задачи", coalesce_key='prompt', reply_markup=self.cancel_buttons)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] in [20, 21, 22, 23])
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) in [20, 21, 22, 23])
         async def send_work_name(message: telebot.types.Message):
             self.userStep[message.chat.id] += 10
 
             self.notion_work_note_item[message.chat.id] = NotionWorkNoteItem()
             self.notion_work_note_item[message.chat.id].name = message.text
 
-            await self.bot.send_message(message.chat.id, "Введите описание задачи (можно прикреплять изображения)", reply_markup=self.skip_cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите описание задачи (можно прикреплять изображения)", coalesce_key='prompt', reply_markup=self.skip_cancel_buttons)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] in [30, 31, 32, 33], content_types=['text', 'photo'])
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) in [30, 31, 32, 33], content_types=['text', 'photo', 'document'])
         async def send_work_description(message: telebot.types.Message):
             if message.text != self.skip_buttons_text:
-                if message.photo is not None:
-                    file_info = await self.bot.get_file(message.photo[-1].file_id)
-                    file = await self.bot.download_file(file_info.file_path)
+                if message.photo is not None or _is_image_document(message):
+                    file_id = message.photo[-1].file_id if message.photo is not None else message.document.file_id
+                    file_info = await self.bot.get_file(file_id)
+                    file = await self.media_transfer.download(file_info.file_path)
 
                     self.notion_work_note_item[message.chat.id].images = []
                     self.notion_work_note_item[message.chat.id].images.append(file)
@@ -177,6 +451,7 @@ class Bot:
                     self.notion_work_note_item[message.chat.id].images = None
                     self.notion_work_note_item[message.chat.id].description = message.text
             else:
+                self.notion_work_note_item[message.chat.id].images = None
                 self.notion_work_note_item[message.chat.id].description = None
 
             match self.userStep[message.chat.id]:
@@ -196,77 +471,144 @@ class Bot:
             self.notion_work_note_item[message.chat.id].deadline = None
 
             # добавление элемента в таблицу Notion
-            self.userStep[message.chat.id] = 0
+            item = self.notion_work_note_item[message.chat.id]
+            _reset_chat(message.chat.id)
+            await _save_work_note_item(message.chat.id, item)
+
+        async def _save_work_note_item(chat_id: int, item: NotionWorkNoteItem) -> None:
+            """
+            Сохранение задачи в таблицу Notion
+            :param chat_id: ID чата для ответа
+            :param item: задача
+            :return: None
+            """
             try:
-                await self.notion_work_note_client.add_item_to_notion(self.notion_work_note_item[message.chat.id])
+                await self.notion_work_note_client.add_item_to_notion(item)
             except APIResponseError as e:
                 logging.log(logging.ERROR, e)
-                await self.bot.send_message(message.chat.id, "Ошибка добавления элемента в таблицу Notion", reply_markup=self.start_buttons)
+                self.outgoing.send_message(chat_id, "Ошибка добавления элемента в таблицу Notion", reply_markup=self.start_buttons)
             else:
-                await self.bot.send_message(message.chat.id, "Задача добавлена в таблицу Notion", reply_markup=self.start_buttons)
+                self.outgoing.send_message(chat_id, "Задача добавлена в таблицу Notion", reply_markup=self.start_buttons)
+            finally:
+                # вложения больше не нужны, не держим их до следующего сообщения
+                for image in item.images or []:
+                    image.close()
+
+        async def _save_notion_item(chat_id: int, item: NotionItem) -> None:
+            """
+            Сохранение элемента в таблицу Notion и в локальный поисковый индекс
+            :param chat_id: ID чата для ответа
+            :param item: элемент таблицы Notion
+            :return: None
+            """
+            theses_task, item.theses_task = item.theses_task, None
+            if theses_task is not None and theses_task.done():
+                # пересказ успел, пока пользователь заполнял остальные поля
+                status, _, theses = theses_task.result() if theses_task.exception() is None else (False, '', '')
+                if status:
+                    item.description = item.description + f'\n\n\nОсновные тезисы статьи:\n{theses}'
+                theses_task = None
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 1)
+            try:
+                page = await item.add_item_to_notion(notion_token, database_id)
+            except APIResponseError as e:
+                logging.log(logging.ERROR, e)
+                self.outgoing.send_message(chat_id, "Ошибка добавления элемента в таблицу Notion", reply_markup=self.start_buttons)
+            else:
+                await self.search_index.index_page(page, item.description)
+                self.outgoing.send_message(chat_id, "Элемент добавлен в таблицу Notion", reply_markup=self.start_buttons)
+
+                if theses_task is not None:
+                    self._background_tasks.add(asyncio.create_task(_append_theses_later(page['id'], theses_task)))
+
+        async def _append_theses_later(page_id: str, theses_task: asyncio.Task) -> None:
+            """
+            Дописывает пересказ в уже сохранённую страницу, когда он будет готов
+            :param page_id: ID страницы Notion
+            :param theses_task: задача получения пересказа
+            :return: None
+            """
+            try:
+                status, _, theses = await theses_task
+                if status:
+                    await NotionItem.append_paragraph(notion_token, page_id, f'Основные тезисы статьи:\n{theses}')
+            except Exception as e:
+                logging.log(logging.ERROR, f'Ошибка дополнения страницы пересказом: {e}')
+            finally:
+                self._background_tasks.discard(asyncio.current_task())
+
+        def _is_image_document(message: telebot.types.Message) -> bool:
+            """
+            Проверка, что документ является изображением (отправлено без сжатия)
+            :param message: сообщение пользователя
+            :return: True, если документ - изображение
+            """
+            return message.document is not None and (message.document.mime_type or '').startswith('image/')
+
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 1)
         async def send_add_url(message: telebot.types.Message):
             self.userStep[message.chat.id] = 2
             self.notionItem[message.chat.id].url = message.text if message.text != self.skip_buttons_text else None
 
-            await self.bot.send_message(message.chat.id, "Введите название материала", reply_markup=self.cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите название материала", coalesce_key='prompt', reply_markup=self.cancel_buttons)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 2)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 2)
         async def send_add_name(message: telebot.types.Message):
             self.userStep[message.chat.id] = 3
             self.notionItem[message.chat.id].name = message.text
 
-            await self.bot.send_message(message.chat.id, "Выберите тип контента", reply_markup=self.content_type_buttons)
+            self.outgoing.send_message(message.chat.id, "Выберите тип контента", coalesce_key='prompt',
+                                       reply_markup=self._options_buttons(self.schemas[message.chat.id].content_types))
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 3)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 3)
         async def send_add_content_type(message: telebot.types.Message):
             self.userStep[message.chat.id] = 4
 
+            content_types = self.schemas[message.chat.id].content_types
+
             # валидация
-            if self.content_types:
-                if not self.content_types.__contains__(message.text):
+            if content_types:
+                if not content_types.__contains__(message.text):
                     self.userStep[message.chat.id] = 3
-                    await self.bot.send_message(message.chat.id,
-                                                "Данный тип контента не существует, попробуйте ещё раз",
-                                                reply_markup=self.content_type_buttons)
+                    self.outgoing.send_message(message.chat.id,
+                                               "Данный тип контента не существует, попробуйте ещё раз",
+                                               coalesce_key='prompt', reply_markup=self._options_buttons(content_types))
                     return
 
             self.notionItem[message.chat.id].content_type = message.text
 
-            await self.bot.send_message(message.chat.id, "Выберите категорию", reply_markup=self.category_buttons)
+            self.outgoing.send_message(message.chat.id, "Выберите категорию", coalesce_key='prompt',
+                                       reply_markup=self._options_buttons(self.schemas[message.chat.id].categories))
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 4)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 4)
         async def send_add_category(message: telebot.types.Message):
             self.userStep[message.chat.id] = 5
 
+            categories = self.schemas[message.chat.id].categories
+
             # валидация
-            if self.categories:
-                if not self.categories.__contains__(message.text):
+            if categories:
+                if not categories.__contains__(message.text):
                     self.userStep[message.chat.id] = 4
-                    await self.bot.send_message(message.chat.id,
-                                                "Данная категория не существует, попробуйте ещё раз",
-                                                reply_markup=self.category_buttons)
+                    self.outgoing.send_message(message.chat.id,
+                                               "Данная категория не существует, попробуйте ещё раз",
+                                               coalesce_key='prompt', reply_markup=self._options_buttons(categories))
                     return
 
             self.notionItem[message.chat.id].category = message.text
 
-            await self.bot.send_message(message.chat.id, "Введите описание материала (или нажмите Пропустить)", reply_markup=self.skip_cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите описание материала (или нажмите Пропустить)", coalesce_key='prompt', reply_markup=self.skip_cancel_buttons)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 5)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 5)
         async def send_add_description(message: telebot.types.Message):
-            self.userStep[message.chat.id] = 0
-            self.notionItem[message.chat.id].description = message.text if message.text != self.skip_buttons_text else None
+            # элемент забирается из состояния чата до сброса, чтобы ожидаемый пересказ не был отменён
+            item = self.notionItem.pop(message.chat.id)
+            _reset_chat(message.chat.id)
+            item.description = message.text if message.text != self.skip_buttons_text else None
 
-            try:
-                await self.notionItem[message.chat.id].add_item_to_notion(notion_token, database_id)
-            except APIResponseError as e:
-                logging.log(logging.ERROR, e)
-                await self.bot.send_message(message.chat.id, "Ошибка добавления элемента в таблицу Notion", reply_markup=self.start_buttons)
-            else:
-                await self.bot.send_message(message.chat.id, "Элемент добавлен в таблицу Notion", reply_markup=self.start_buttons)
+            await _save_notion_item(message.chat.id, item)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 11)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 11)
         async def send_multiple_links(message: telebot.types.Message):
             self.userStep[message.chat.id] = 10
             if message.text != self.skip_buttons_text and message.text != self.approve_buttons_text:
@@ -275,7 +617,26 @@ class Bot:
             await send_forwarded_name_before(message)
 
         async def send_forwarded_name_before(message: telebot.types.Message):
-            status, title, theses = _try_parse_post_theses(self.notionItem[message.chat.id].url)
+            url = self.notionItem[message.chat.id].url
+
+            # пересказ ждём не дольше бюджета, иначе он будет дописан в страницу после сохранения
+            theses_task = asyncio.create_task(_try_parse_post_theses(url))
+            preview_task = asyncio.create_task(self.link_preview.resolve(url)) if url else None
+            done, _ = await asyncio.wait({theses_task}, timeout=self.enrichment_budget_ms / 1000)
+
+            if theses_task in done:
+                status, title, theses = theses_task.result()
+            else:
+                status, title, theses = False, '', ''
+                self.notionItem[message.chat.id].theses_task = theses_task
+
+            if preview_task is not None:
+                if title:
+                    preview_task.cancel()
+                else:
+                    # название из метаданных страницы, если пересказ не дал заголовка
+                    preview = await preview_task
+                    title = preview.title if preview and preview.title else ''
 
             title = title.replace('\n', '').strip()
 
@@ -283,7 +644,7 @@ class Bot:
                 self.notionItem[message.chat.id].description = \
                     self.notionItem[message.chat.id].description + f'\n\n\nОсновные тезисы статьи:\n{theses}'
 
-            if status and title != self.notionItem[message.chat.id].name:
+            if title and title != self.notionItem[message.chat.id].name:
                 self.notionItem[message.chat.id].name_variant = title
 
                 text = "Выберите или, при необходимости, исправьте название материала:\n\n" + \
@@ -293,14 +654,14 @@ class Bot:
                 variants_buttons = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True)
                 variants_buttons.add('1', '2', self.cancel_buttons_text)
 
-                await self.bot.send_message(message.chat.id, text, reply_markup=variants_buttons)
+                self.outgoing.send_message(message.chat.id, text, coalesce_key='prompt', reply_markup=variants_buttons)
             else:
                 text = "Подтвердите название материала или исправьте, если необходимо:\n\n" + \
                        f"'{self.notionItem[message.chat.id].name}'\n\n"
 
-                await self.bot.send_message(message.chat.id, text, reply_markup=self.approve_cancel_buttons)
+                self.outgoing.send_message(message.chat.id, text, coalesce_key='prompt', reply_markup=self.approve_cancel_buttons)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 10)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 10)
         async def send_forwarded_name(message: telebot.types.Message):
             self.userStep[message.chat.id] = 12
             if message.text == '2':
@@ -308,61 +669,63 @@ class Bot:
             elif message.text != '1' and message.text != self.approve_buttons_text and message.text != self.skip_buttons_text:
                 self.notionItem[message.chat.id].name = message.text
 
-            await self.bot.send_message(message.chat.id, "Введите описание материала (или нажмите Пропустить)", reply_markup=self.skip_cancel_buttons)
+            self.outgoing.send_message(message.chat.id, "Введите описание материала (или нажмите Пропустить)", coalesce_key='prompt', reply_markup=self.skip_cancel_buttons)
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 12)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 12)
         async def send_forwarded_description(message: telebot.types.Message):
             self.userStep[message.chat.id] = 13
             if message.text != self.skip_buttons_text and message.text != self.approve_buttons_text:
                 self.notionItem[message.chat.id].description = message.text
 
-            await self.bot.send_message(message.chat.id, "Выберите тип контента", reply_markup=self.content_type_buttons)
+            self.outgoing.send_message(message.chat.id, "Выберите тип контента", coalesce_key='prompt',
+                                       reply_markup=self._options_buttons(self.schemas[message.chat.id].content_types))
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 13)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 13)
         async def send_forwarded_add_content_type(message: telebot.types.Message):
             self.userStep[message.chat.id] = 14
 
+            content_types = self.schemas[message.chat.id].content_types
+
             # валидация
-            if self.content_types:
-                if not self.content_types.__contains__(message.text):
+            if content_types:
+                if not content_types.__contains__(message.text):
                     self.userStep[message.chat.id] = 13
-                    await self.bot.send_message(message.chat.id,
-                                                "Данный тип контента не существует, попробуйте ещё раз",
-                                                reply_markup=self.content_type_buttons)
+                    self.outgoing.send_message(message.chat.id,
+                                               "Данный тип контента не существует, попробуйте ещё раз",
+                                               coalesce_key='prompt', reply_markup=self._options_buttons(content_types))
                     return
 
             self.notionItem[message.chat.id].content_type = message.text
 
-            await self.bot.send_message(message.chat.id, "Выберите категорию", reply_markup=self.category_buttons)
+            self.outgoing.send_message(message.chat.id, "Выберите категорию", coalesce_key='prompt',
+                                       reply_markup=self._options_buttons(self.schemas[message.chat.id].categories))
 
-        @self.bot.message_handler(func=lambda message: self.userStep[message.chat.id] == 14)
+        @self.bot.message_handler(func=lambda message: self.userStep.get(message.chat.id, 0) == 14)
         async def send_forwarded_add_category(message: telebot.types.Message):
-            self.userStep[message.chat.id] = 0
+            categories = self.schemas[message.chat.id].categories
 
             # валидация
-            if self.categories:
-                if not self.categories.__contains__(message.text):
-                    self.userStep[message.chat.id] = 14
-                    await self.bot.send_message(message.chat.id,
-                                                "Данная категория не существует, попробуйте ещё раз",
-                                                reply_markup=self.category_buttons)
+            if categories:
+                if not categories.__contains__(message.text):
+                    self.outgoing.send_message(message.chat.id,
+                                               "Данная категория не существует, попробуйте ещё раз",
+                                               coalesce_key='prompt', reply_markup=self._options_buttons(categories))
                     return
 
-            self.notionItem[message.chat.id].category = message.text
+            # элемент забирается из состояния чата до сброса, чтобы ожидаемый пересказ не был отменён
+            item = self.notionItem.pop(message.chat.id)
+            _reset_chat(message.chat.id)
+            item.category = message.text
 
-            try:
-                await self.notionItem[message.chat.id].add_item_to_notion(notion_token, database_id)
-            except APIResponseError as e:
-                logging.log(logging.ERROR, e)
-                await self.bot.send_message(message.chat.id, "Ошибка добавления элемента в таблицу Notion", reply_markup=self.start_buttons)
-            else:
-                await self.bot.send_message(message.chat.id, "Элемент добавлен в таблицу Notion", reply_markup=self.start_buttons)
+            await _save_notion_item(message.chat.id, item)
 
-        # Должен быть самым последним обработчиком, так как он пытается обработать любое сообщение
-        @self.bot.message_handler(content_types=['text', 'photo', 'document', 'animation', 'video'])
+        # Должен быть самым последним обработчиком, так как он пытается обработать любое сообщение.
+        # Сообщения, отправленные через инлайн-режим этого бота, уже обработаны в send_quick_add_chosen
+        @self.bot.message_handler(content_types=['text', 'photo', 'document', 'animation', 'video'],
+                                  func=lambda message: message.via_bot is None or str(message.via_bot.id) != bot_id)
         async def forwarded_message(message: telebot.types.Message):
             self.userStep[message.chat.id] = 10
-            notion_item, parsing_code = _parse_post(message)
+            notion_item, parsing_code = await _parse_post(message)
 
             self.notionItem[message.chat.id] = notion_item
 
@@ -370,14 +733,14 @@ class Bot:
 
             if parsing_code == 1:
                 self.userStep[message.chat.id] = 11
-                await self.bot.send_message(message.chat.id, "Было обнаружено несколько ссылок.\n"
-                                                             f"Выбрана: {notion_item.url}\n\n"
-                                                             "Подтвердите выбор, или введите свой вариант",
-                                            reply_markup=self.approve_cancel_buttons)
+                self.outgoing.send_message(message.chat.id, "Было обнаружено несколько ссылок.\n"
+                                                            f"Выбрана: {notion_item.url}\n\n"
+                                                            "Подтвердите выбор, или введите свой вариант",
+                                           coalesce_key='prompt', reply_markup=self.approve_cancel_buttons)
             else:
                 await send_forwarded_name_before(message)
 
-        def _parse_post(message: telebot.types.Message) -> Tuple[NotionItem, int]:
+        async def _parse_post(message: telebot.types.Message) -> Tuple[NotionItem, int]:
             """
             Парсер поста с полезной информацией
             :param message: сообщение пользователя
@@ -389,7 +752,7 @@ class Bot:
             url_pattern = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
             urls = url_pattern.findall(text_html)
 
-            try_youtube_name = _try_parse_video_link(urls[0] if urls else None)
+            try_youtube_name = await _try_parse_video_link(urls[0] if urls else None)
 
             item = NotionItem()
             item.url = urls[0] if urls else None
@@ -429,7 +792,7 @@ class Bot:
 
             return text
 
-        def _try_parse_video_link(link: str | None) -> str | None:
+        async def _try_parse_video_link(link: str | None) -> str | None:
             """
             Парсер ссылки на видео (youtube)
             :param link: ссылка
@@ -439,65 +802,224 @@ class Bot:
                 return None
 
             if link.__contains__('youtube') or link.__contains__('youtu.be'):
-                r = requests.get(link)
-                data = r.text
-                soup = BeautifulSoup(data, 'html.parser')
-                video_name = str(soup.find('title').text)
-                return video_name.replace(' - YouTube', '')
+                preview = await self.link_preview.resolve(link)
+                if preview is None or preview.title is None:
+                    return None
+                return preview.title.replace(' - YouTube', '')
 
             return None
 
-        def _try_parse_post_theses(link: str) -> Tuple[bool, str, str]:
+        async def _try_parse_post_theses(link: str | None) -> Tuple[bool, str, str]:
             """
             Парсер текста поста
             :param link: ссылка на пост
             :return: успешность, заголовок, основные тезисы материала
             """
-            endpoint = 'https://300.ya.ru/api/sharing-url'
-            response = requests.post(endpoint,
-                                     json={'article_url': link},
-                                     headers={'Authorization': f'OAuth {yandex_token}'})
-            data = response.json()
+            if link is None or not self.yandex_breaker.allow():
+                return False, '', ''
+
+            try:
+                session = await self._get_http_session()
+                async with session.post(self.yandex_endpoint,
+                                        json={'article_url': link},
+                                        headers={'Authorization': f'OAuth {yandex_token}'},
+                                        timeout=aiohttp.ClientTimeout(total=self.yandex_timeout)) as response:
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                self.yandex_breaker.record_failure()
+                logging.log(logging.WARNING, f'YandexGPT недоступен: {e}')
+                return False, '', ''
+            except asyncio.CancelledError:
+                # отмена диалога или остановка бота - не ошибка сервиса, но пробную попытку нужно освободить
+                self.yandex_breaker.record_cancelled()
+                raise
+
+            if not isinstance(data, dict) or data.get('status') is None or (data['status'] == 'success' and not data.get('sharing_url')):
+                # ответ неожиданного формата - такой же отказ сервиса, как и ошибка сети
+                self.yandex_breaker.record_failure()
+                logging.log(logging.WARNING, f'Неожиданный ответ YandexGPT: {str(data)[:200]}')
+                return False, '', ''
+
+            self.yandex_breaker.record_success()
             status = data['status']
             parsed_url = data['sharing_url'] if status == 'success' else None
 
             if status == 'success':
-                r = requests.get(parsed_url)
-                r.encoding = 'utf-8'
-                data = r.text
-                soup = BeautifulSoup(data, 'html.parser')
-
-                try:
-                    title = soup.find('meta', {'property': 'og:title'})
-                    title = str(title.get('content')) if title else None
-                    title = title.replace(' - Пересказ YandexGPT', '')
-                except:
+                preview = await self.link_preview.resolve(parsed_url, use_cache=False)
+                if preview is None or preview.title is None:
                     return False, '', ''
 
-                theses = soup.find('meta', {'property': 'og:description'})
-                theses = str(theses.get('content')) if theses else None
-
-                return True, title, theses
+                title = preview.title.replace(' - Пересказ YandexGPT', '')
+                return True, title, preview.description
             else:
                 return False, '', ''
 
+        async def _render_search_page(query: str, offset: int) -> Tuple[str, telebot.types.InlineKeyboardMarkup | None]:
+            """
+            Формирование страницы результатов поиска
+            :param query: поисковый запрос
+            :param offset: смещение страницы
+            :return: текст сообщения (HTML) и кнопки переключения страниц
+            """
+            results, total = await self.search_index.search(query, offset, self.search_page_size)
+
+            if total == 0:
+                return f'По запросу «{html.escape(query)}» ничего не найдено', None
+
+            lines = [f'Найдено: {total}\n']
+            for i, result in enumerate(results, start=offset + 1):
+                name = html.escape(result.name or '-')
+                title = f'<a href="{html.escape(result.url)}">{name}</a>' if result.url else f'<b>{name}</b>'
+                lines.append(f'{i}. {title}\n{html.escape(result.content_type or "-")} · {html.escape(result.category or "-")}')
+
+            markup = telebot.types.InlineKeyboardMarkup()
+            buttons = []
+            if offset > 0:
+                buttons.append(telebot.types.InlineKeyboardButton('◀️', callback_data=f'search:{max(offset - self.search_page_size, 0)}'))
+            if offset + self.search_page_size < total:
+                buttons.append(telebot.types.InlineKeyboardButton('▶️', callback_data=f'search:{offset + self.search_page_size}'))
+            markup.row(*buttons)
+
+            return '\n\n'.join(lines), markup if buttons else None
+
+        async def _render_tasks_overview() -> Tuple[str, telebot.types.InlineKeyboardMarkup]:
+            """
+            Формирование списка квадрантов с количеством открытых задач
+            :return: текст сообщения и кнопки квадрантов
+            """
+            quadrants = list(self.notion_work_note_client.quadrants)
+            tasks = await asyncio.gather(*[self.notion_work_note_client.get_open_tasks(x) for x in quadrants])
+
+            markup = telebot.types.InlineKeyboardMarkup()
+            for quadrant, quadrant_tasks in zip(quadrants, tasks):
+                markup.add(telebot.types.InlineKeyboardButton(f"{self.commands['add_work_' + quadrant]} ({len(quadrant_tasks)})",
+                                                              callback_data=f'tasks:{quadrant}'))
+
+            return 'Открытые задачи:', markup
+
+        async def _render_tasks_quadrant(quadrant: str, offset: int = 0) -> Tuple[str, telebot.types.InlineKeyboardMarkup]:
+            """
+            Формирование страницы открытых задач квадранта с кнопками завершения
+            :param quadrant: ключ квадранта
+            :param offset: смещение страницы
+            :return: текст сообщения и кнопки задач
+            """
+            tasks = await self.notion_work_note_client.get_open_tasks(quadrant)
+            # после завершения последней задачи страницы показывается последняя непустая страница
+            if offset >= len(tasks):
+                offset = max(len(tasks) - 1, 0) // self.tasks_page_size * self.tasks_page_size
+
+            markup = telebot.types.InlineKeyboardMarkup()
+            for task in tasks[offset:offset + self.tasks_page_size]:
+                markup.add(telebot.types.InlineKeyboardButton(f'✅ {task.name}', callback_data=f'done:{quadrant}:{task.page_id}:{offset}'))
+
+            buttons = []
+            if offset > 0:
+                buttons.append(telebot.types.InlineKeyboardButton('◀️', callback_data=f'tasks:{quadrant}:{max(offset - self.tasks_page_size, 0)}'))
+            if offset + self.tasks_page_size < len(tasks):
+                buttons.append(telebot.types.InlineKeyboardButton('▶️', callback_data=f'tasks:{quadrant}:{offset + self.tasks_page_size}'))
+            if buttons:
+                markup.row(*buttons)
+            markup.add(telebot.types.InlineKeyboardButton('◀️ Все квадранты', callback_data='tasks:'))
+
+            title = self.commands['add_work_' + quadrant]
+            if not tasks:
+                return f'{title}: открытых задач нет', markup
+            return f'{title}: {len(tasks)}\nНажмите на задачу, чтобы отметить её выполненной', markup
+
+        async def _parse_quick_add(text: str) -> NotionItem:
+            """
+            Разбор быстрого добавления материала с проверкой по схеме таблицы (из кэша)
+            :param text: текст после команды
+            :return: элемент таблицы Notion
+            :raises ValueError: если текст не соответствует формату
+            """
+            content_types, categories = await NotionItem.get_content_types_and_categories(notion_token, database_id)
+            return QuickAdd.parse_material(text, content_types, categories)
+
         async def _get_variants(chat_id: int) -> None:
             """
-            Получение списка вариантов категорий и типов контента
+            Получение снимка схемы таблицы (типы контента и категории) для диалога пользователя
+            :param chat_id: ID чата
+            :return: None
+            """
+            self.schemas[chat_id] = await NotionItem.get_schema(notion_token, database_id)
+
+        def _reset_chat(chat_id: int) -> None:
+            """
+            Завершение диалога: состояние чата больше не хранится
             :param chat_id: ID чата
             :return: None
             """
-            self.content_types.clear()
-            self.categories.clear()
-            self.content_types, self.categories = \
-                await self.notionItem[chat_id].get_content_types_and_categories(notion_token, database_id)
+            self.userStep.pop(chat_id, None)
+            item = self.notionItem.pop(chat_id, None)
+            if item is not None and item.theses_task is not None:
+                # пересказ для несохранённого материала больше не нужен
+                item.theses_task.cancel()
+            self.notion_work_note_item.pop(chat_id, None)
+            self.schemas.pop(chat_id, None)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _options_buttons(options: Tuple[str, ...]) -> telebot.types.ReplyKeyboardMarkup:
+        """
+        Кнопки выбора варианта. Кэшируются по набору вариантов и после создания не изменяются,
+        поэтому одни и те же кнопки можно отправлять в разные чаты одновременно
+        :param options: варианты (из снимка схемы таблицы)
+        :return: кнопки
+        """
+        buttons = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True)
+        buttons.add(*options)
+        return buttons
+
+    async def prewarm(self) -> None:
+        """
+        Прогрев после старта поллинга: соединения с Notion и ImageKit и схема таблицы,
+        чтобы первое сообщение после перезапуска не ждало TLS рукопожатий
+        """
+        started_at = time.perf_counter()
 
-            self.content_type_buttons.keyboard.clear()
-            self.category_buttons.keyboard.clear()
+        results = await asyncio.gather(
+            NotionItem.get_content_types_and_categories(self._notion_token, self._database_id),
+            self.notion_work_note_client.prewarm(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logging.log(logging.WARNING, f'Ошибка прогрева: {result}')
 
-            self.content_type_buttons.add(*self.content_types)
-            self.category_buttons.add(*self.categories)
+        print(f'Бот готов к работе, прогрев занял {(time.perf_counter() - started_at) * 1000:.0f} мс')
 
-    def run(self):
-        """Запустить бота"""
-        return asyncio.run(self.bot.polling(non_stop=True))
+    def register(self, supervisor: Supervisor) -> None:
+        """
+        Зарегистрировать задачи бота в супервизоре: поллинг, прогрев, синхронизацию поискового индекса и обновление кэша задач
+        :param supervisor: супервизор процесса
+        """
+        supervisor.add_service('polling', lambda: self.bot.polling(non_stop=True), stops_intake=True)
+        supervisor.add_service('prewarm', self.prewarm, restart=False)
+        supervisor.add_service('search_sync', lambda: self.search_index.run_sync_loop(self.search_sync_interval, self.search_full_sync_interval))
+        supervisor.add_service('tasks_cache', lambda: self.notion_work_note_client.run_tasks_refresh_loop(self.tasks_refresh_interval))
+        supervisor.add_shutdown_hook(self.drain)
+
+    async def drain(self) -> None:
+        """Дождаться обработки полученных обновлений, фоновых дополнений страниц и отправки ответов, затем закрыть соединение с Telegram"""
+        await self.bot.drain()
+        if self._profile_task is not None:
+            # окно профилирования может быть дольше времени на остановку
+            self._profile_task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.outgoing.drain()
+        await self.bot.close_session()
+        await self.link_preview.close()
+        if self._http_session is not None:
+            await self._http_session.close()
+
+    async def _get_http_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает HTTP сессию для запросов к YandexGPT
+        :return: HTTP сессия
+        """
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession()
+        return self._http_session
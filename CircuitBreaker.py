@@ -0,0 +1,72 @@
+import time
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса: после серии ошибок перестаёт обращаться к сервису на время,
+    затем пропускает одну пробную попытку.
+    Используется из одного event loop, поэтому блокировки не нужны
+    """
+
+    failure_threshold: int
+    """Количество ошибок подряд, после которого сервис отключается"""
+
+    reset_timeout: float
+    """Время, на которое сервис отключается (секунды)"""
+
+    _failures: int
+    """Текущее количество ошибок подряд"""
+
+    _opened_at: float | None
+    """Время отключения сервиса (time.monotonic) или None, если сервис доступен"""
+
+    _trial_in_progress: bool
+    """Выполняется ли пробная попытка после отключения"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60):
+        """
+        Конструктор
+        :param failure_threshold: количество ошибок подряд до отключения
+        :param reset_timeout: время отключения (секунды)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    @property
+    def is_open(self) -> bool:
+        """Отключён ли сервис"""
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        Можно ли обращаться к сервису
+        :return: True, если обращение разрешено
+        """
+        if self._opened_at is None:
+            return True
+
+        if self._trial_in_progress or time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+
+        self._trial_in_progress = True
+        return True
+
+    def record_success(self) -> None:
+        """Сообщить об успешном обращении"""
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        """Сообщить об ошибке обращения"""
+        self._failures += 1
+        self._trial_in_progress = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """Сообщить, что обращение отменено, не дождавшись ответа (пробная попытка освобождается, результат не учитывается)"""
+        self._trial_in_progress = False
@@ -0,0 +1,123 @@
+from datetime import datetime
+from typing import BinaryIO, List
+
+import aiohttp
+
+from ImageStore import ImageStore, ImageStoreCapabilities
+from MediaTransfer import MediaTransfer
+
+
+class ImageKitImageStore(ImageStore):
+    """
+    Хранилище изображений ImageKit (HTTP API, без SDK)
+    """
+
+    capabilities = ImageStoreCapabilities(delete_batch_size=100, max_concurrency=4, can_delete=True)
+
+    _private_key: str
+    """Приватный ключ (используется для авторизации в HTTP API)"""
+
+    _public_key: str
+    """Публичный ключ"""
+
+    _url_endpoint: str
+    """Адрес"""
+
+    _session: aiohttp.ClientSession | None
+    """HTTP сессия"""
+
+    upload_endpoint: str = 'https://upload.imagekit.io/api/v1/files/upload'
+    """Адрес API загрузки файлов"""
+
+    files_endpoint: str = 'https://api.imagekit.io/v1/files'
+    """Адрес API управления файлами"""
+
+    list_page_size: int = 1000
+    """Количество файлов на странице списка"""
+
+    def __init__(self, privateKey: str, publicKey: str, urlEndpoint: str):
+        """
+        Конструктор
+        :param privateKey: приватный ключ
+        :param publicKey: публичный ключ
+        :param urlEndpoint: адрес
+        """
+        self._session = None
+        self._private_key = privateKey
+        self._public_key = publicKey
+        self._url_endpoint = urlEndpoint
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает HTTP сессию
+        :return: HTTP сессия
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(auth=aiohttp.BasicAuth(self._private_key, ''))
+        return self._session
+
+    async def upload_stream(self, stream: BinaryIO, file_name: str | None = None) -> str:
+        """
+        Загружает файл потоково, блоками, не держа его целиком в памяти
+        :param stream: файловый объект, установленный на начало
+        :param file_name: имя файла (по умолчанию генерируется)
+        :return: ссылка на загруженный файл
+        """
+        file_name = file_name or self._generate_file_name()
+
+        form = aiohttp.FormData()
+        form.add_field('file', MediaTransfer.iter_chunks(stream), filename=file_name, content_type='application/octet-stream')
+        form.add_field('fileName', file_name)
+        form.add_field('useUniqueFileName', 'true')
+        form.add_field('tags', 'image')
+        form.add_field('isPrivateFile', 'false')
+
+        session = await self._get_session()
+        async with session.post(self.upload_endpoint, data=form) as response:
+            response.raise_for_status()
+            result = await response.json()
+
+        return result['url']
+
+    async def prewarm(self) -> None:
+        """
+        Заранее устанавливает соединение с API загрузки, чтобы первая загрузка не ждала TLS рукопожатия
+        """
+        session = await self._get_session()
+        async with session.head(self.upload_endpoint):
+            pass
+
+    async def close(self) -> None:
+        """Закрыть HTTP сессию"""
+        if self._session is not None:
+            await self._session.close()
+
+    async def _list_outdated(self, cutoff: datetime) -> List[str]:
+        """
+        Список файлов, загруженных раньше cutoff
+        :param cutoff: граница (UTC)
+        :return: ID файлов
+        """
+        session = await self._get_session()
+        search_query = f'createdAt < "{cutoff.strftime("%Y-%m-%dT%H:%M:%SZ")}"'
+        file_ids = []
+
+        while True:
+            params = {'type': 'file', 'sort': 'ASC_CREATED', 'searchQuery': search_query,
+                      'skip': str(len(file_ids)), 'limit': str(self.list_page_size)}
+            async with session.get(self.files_endpoint, params=params) as response:
+                response.raise_for_status()
+                files = await response.json()
+
+            file_ids.extend(x['fileId'] for x in files)
+            if len(files) < self.list_page_size:
+                return file_ids
+
+    async def _delete(self, ids: List[str]) -> None:
+        """
+        Удаляет файлы одним запросом
+        :param ids: ID файлов
+        """
+        session = await self._get_session()
+        async with session.post(f'{self.files_endpoint}/batch/deleteByFileIds', json={'fileIds': ids}) as response:
+            response.raise_for_status()
@@ -1,95 +1,115 @@
-import base64
-from datetime import datetime
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, List, NamedTuple
 
-from imagekitio import ImageKit
-from imagekitio.models.ListAndSearchFileRequestOptions import ListAndSearchFileRequestOptions
-from imagekitio.models.UploadFileRequestOptions import UploadFileRequestOptions
-from imagekitio.models.results.UploadFileResult import UploadFileResult
+from Supervisor import Supervisor
 
 
-class ImageStore:
+class ImageStoreCapabilities(NamedTuple):
+    """
+    Возможности хранилища изображений
+    """
+
+    delete_batch_size: int
+    """Сколько файлов удаляется одним запросом"""
+
+    max_concurrency: int
+    """Сколько файлов можно загружать параллельно"""
+
+    can_delete: bool
+    """Поддерживается ли удаление старых изображений"""
 
-    _image_kit: ImageKit | None
+
+class ImageStore(ABC):
     """
-    Клиент для сохранения изображений
+    Хранилище изображений, на которые ссылаются страницы Notion.
+    Реализации: ImageKitImageStore, S3ImageStore, LocalImageStore
     """
 
-    def __init__(self, privateKey: str, publicKey: str, urlEndpoint: str):
+    capabilities: ImageStoreCapabilities
+    """Возможности хранилища"""
+
+    @abstractmethod
+    async def upload_stream(self, stream: BinaryIO, file_name: str | None = None) -> str:
         """
-        Конструктор
-        :param privateKey: приватный ключ
-        :param publicKey: публичный ключ
-        :param urlEndpoint: адрес
+        Загружает файл потоково, блоками, не держа его целиком в памяти
+        :param stream: файловый объект, установленный на начало
+        :param file_name: имя файла (по умолчанию генерируется)
+        :return: публичная ссылка на загруженный файл
         """
-        self._image_kit = None
-        self._get_image_kit(privateKey, publicKey, urlEndpoint)
 
-    def _get_image_kit(self, privateKey: str, publicKey: str, urlEndpoint: str) -> ImageKit:
+    async def upload_images(self, images: List[BinaryIO]) -> List[str]:
         """
-        Возвращает клиент для сохранения изображений
-        :param privateKey: приватный ключ
-        :param publicKey: публичный ключ
-        :param urlEndpoint: адрес
-        :return: клиент для сохранения изображений
+        Загружает все изображения, параллельно в пределах возможностей хранилища
+        :param images: список файловых объектов с изображениями
+        :return: список ссылок на изображения (в том же порядке)
         """
-        if self._image_kit is None:
-            self._image_kit = ImageKit(
-                public_key=publicKey,
-                private_key=privateKey,
-                url_endpoint=urlEndpoint
-            )
-        return self._image_kit
+        semaphore = asyncio.Semaphore(self.capabilities.max_concurrency)
+
+        async def upload(image: BinaryIO) -> str:
+            async with semaphore:
+                return await self.upload_stream(image)
+
+        # дожидаемся всех загрузок, чтобы не читать файлы после того, как их закроет вызывающая сторона
+        results = await asyncio.gather(*[upload(x) for x in images], return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
 
-    def upload_images(self, images: list[bytes]) -> list[str]:
+    async def delete_outdated_images(self, max_age: float) -> int:
         """
-        Загружает все изображения
-        :param images: список изображений
-        :return: список ссылок на изображения
+        Удаляет изображения старше max_age
+        :param max_age: максимальный возраст изображения (секунды)
+        :return: количество удалённых изображений
         """
-        options = UploadFileRequestOptions(
-            use_unique_file_name=True,
-            tags=["image"],
-            is_private_file=False
-        )
+        if not self.capabilities.can_delete:
+            return 0
 
-        results: list[UploadFileResult] = []
+        outdated = await self._list_outdated(datetime.now(timezone.utc) - timedelta(seconds=max_age))
 
-        for image in images:
-            encoded_file = base64.b64encode(image)
+        batch_size = self.capabilities.delete_batch_size
+        for i in range(0, len(outdated), batch_size):
+            await self._delete(outdated[i:i + batch_size])
 
-            results.append(self._image_kit.upload_file(
-                file=encoded_file,
-                file_name=self._generate_file_name(),
-                options=options
-            ))
+        return len(outdated)
 
-        return list(map(lambda x: x.url, results))
+    async def prewarm(self) -> None:
+        """
+        Заранее устанавливает соединение с хранилищем, чтобы первая загрузка не ждала TLS рукопожатия
+        """
 
-    def delete_outdated_images(self) -> None:
+    async def close(self) -> None:
+        """Закрыть соединения"""
+
+    def register(self, supervisor: Supervisor) -> None:
         """
-        Удаляет старые изображения
+        Зарегистрировать в супервизоре то, что нужно хранилищу (например, HTTP маршрут для раздачи файлов)
+        :param supervisor: супервизор процесса
         """
-        try:
-            options = ListAndSearchFileRequestOptions(
-                type='file',
-                sort='ASC_CREATED',
-                search_query="created_at >= '90d'",
-                file_type='all',
-            )
-            find_result = self._image_kit.list_files(options)
 
-            deleting_ids = [x.file_id for x in find_result.list]
+    @abstractmethod
+    async def _list_outdated(self, cutoff: datetime) -> List[str]:
+        """
+        Список изображений, загруженных раньше cutoff
+        :param cutoff: граница (UTC)
+        :return: идентификаторы изображений для _delete
+        """
 
-            self._image_kit.bulk_file_delete(deleting_ids)
-        except Exception as e:
-            print('Delete outdated images error (maybe not found)', e)
+    @abstractmethod
+    async def _delete(self, ids: List[str]) -> None:
+        """
+        Удаляет изображения (не больше delete_batch_size за вызов)
+        :param ids: идентификаторы изображений
+        """
 
     @staticmethod
-    def _generate_file_name() -> str:
+    def _generate_file_name(extension: str = '.jpg') -> str:
         """
-        Генерирует имя для изображения
+        Генерирует уникальное имя для изображения
+        :param extension: расширение файла
         :return: имя для изображения
         """
-        file_name = "image_" + datetime.now().strftime('%Y_%m_%d_%H_%M_%S') + ".jpg"
-
-        return file_name
+        return "image_" + datetime.now().strftime('%Y_%m_%d_%H_%M_%S') + '_' + uuid.uuid4().hex[:8] + extension
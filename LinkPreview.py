@@ -0,0 +1,170 @@
+import asyncio
+import codecs
+import logging
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Dict, NamedTuple, Tuple
+
+import aiohttp
+
+
+class LinkPreview(NamedTuple):
+    """
+    Метаданные страницы (OpenGraph или <title>)
+    """
+
+    title: str | None
+    description: str | None
+    site_name: str | None
+
+
+class _HeadParser(HTMLParser):
+    """
+    Потоковый разборщик <head>: собирает og:* и <title>, останавливается на </head> или <body>
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta: Dict[str, str] = {}
+        self.title: str | None = None
+        self.done = False
+        self._in_title = False
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag == 'body':
+            self.done = True
+        elif tag == 'title' and self.title is None:
+            self._in_title = True
+            self.title = ''
+        elif tag == 'meta':
+            attributes = dict(attrs)
+            key = attributes.get('property') or attributes.get('name')
+            if key and key.startswith('og:') and attributes.get('content') and key not in self.meta:
+                self.meta[key] = attributes['content']
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == 'head':
+            self.done = True
+        elif tag == 'title':
+            self._in_title = False
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+
+
+class LinkPreviewResolver:
+    """
+    Получение названия и описания страницы по ссылке: читается только <head>, с ограничением размера и времени,
+    результаты кэшируются
+    """
+
+    max_bytes: int
+    """Максимальный объём загружаемых данных (байт)"""
+
+    timeout: float
+    """Таймаут получения страницы (секунды)"""
+
+    cache_size: int
+    """Максимальное количество ссылок в кэше"""
+
+    cache_ttl: float
+    """Время жизни записи в кэше (секунды)"""
+
+    chunk_size: int = 16 * 1024
+    """Размер блока чтения (байт)"""
+
+    _cache: 'OrderedDict[str, Tuple[float, LinkPreview | None]]'
+    """Кэш: ссылка -> (время истечения, метаданные)"""
+
+    _session: aiohttp.ClientSession | None
+    """HTTP сессия"""
+
+    def __init__(self, max_bytes: int = 256 * 1024, timeout: float = 3, cache_size: int = 512, cache_ttl: float = 6 * 60 * 60):
+        """
+        Конструктор
+        :param max_bytes: максимальный объём загружаемых данных (байт)
+        :param timeout: таймаут получения страницы (секунды)
+        :param cache_size: максимальное количество ссылок в кэше
+        :param cache_ttl: время жизни записи в кэше (секунды)
+        """
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._session = None
+
+    async def resolve(self, url: str, use_cache: bool = True) -> LinkPreview | None:
+        """
+        Получить метаданные страницы
+        :param url: ссылка
+        :param use_cache: использовать кэш
+        :return: метаданные или None, если страница недоступна или не является HTML
+        """
+        if use_cache:
+            cached = self._cache.get(url)
+            if cached is not None and cached[0] > time.monotonic():
+                self._cache.move_to_end(url)
+                return cached[1]
+
+        try:
+            preview = await asyncio.wait_for(self._fetch(url), self.timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, ValueError) as e:
+            logging.log(logging.WARNING, f'Не удалось получить метаданные {url}: {e}')
+            preview = None
+
+        if use_cache:
+            self._cache[url] = (time.monotonic() + self.cache_ttl, preview)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return preview
+
+    async def close(self) -> None:
+        """Закрыть HTTP сессию"""
+        if self._session is not None:
+            await self._session.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает HTTP сессию
+        :return: HTTP сессия
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={'User-Agent': 'Mozilla/5.0 (compatible; NotionStorageBot)',
+                                                           'Accept': 'text/html,application/xhtml+xml'})
+        return self._session
+
+    async def _fetch(self, url: str) -> LinkPreview | None:
+        """
+        Загрузка страницы до </head>
+        :param url: ссылка
+        :return: метаданные или None
+        """
+        session = await self._get_session()
+        async with session.get(url) as response:
+            if response.status != 200 or 'html' not in response.content_type:
+                return None
+
+            try:
+                decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+            except LookupError:
+                # неизвестная кодировка в Content-Type
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            parser = _HeadParser()
+            received = 0
+
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if parser.done or received >= self.max_bytes:
+                    break
+
+        title = parser.meta.get('og:title') or (parser.title.strip() if parser.title else None)
+        if not title and not parser.meta:
+            return None
+
+        return LinkPreview(title, parser.meta.get('og:description'), parser.meta.get('og:site_name'))
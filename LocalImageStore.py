@@ -0,0 +1,94 @@
+import asyncio
+import os
+import shutil
+from datetime import datetime
+from typing import BinaryIO, List
+
+from ImageStore import ImageStore, ImageStoreCapabilities
+from Supervisor import Supervisor
+
+
+class LocalImageStore(ImageStore):
+    """
+    Хранилище изображений на локальном диске; файлы раздаёт HTTP сервер супервизора (тот же, что отдаёт /health).
+    public_url должен быть доступен из интернета, иначе Notion не сможет показать изображение
+    """
+
+    capabilities = ImageStoreCapabilities(delete_batch_size=500, max_concurrency=4, can_delete=True)
+
+    route_prefix: str = '/images/'
+    """Путь, по которому раздаются изображения"""
+
+    chunk_size: int = 64 * 1024
+    """Размер блока записи (байт)"""
+
+    _directory: str
+    """Каталог с изображениями"""
+
+    _public_url: str
+    """Публичный адрес HTTP сервера бота"""
+
+    def __init__(self, directory: str, public_url: str):
+        """
+        Конструктор
+        :param directory: каталог с изображениями (создаётся при необходимости)
+        :param public_url: публичный адрес HTTP сервера бота (например, https://bot.example.com)
+        """
+        self._directory = os.path.abspath(directory)
+        self._public_url = public_url.rstrip('/')
+        os.makedirs(self._directory, exist_ok=True)
+
+    async def upload_stream(self, stream: BinaryIO, file_name: str | None = None) -> str:
+        """
+        Сохраняет файл на диск блоками (в отдельном потоке, чтобы не блокировать event loop)
+        :param stream: файловый объект, установленный на начало
+        :param file_name: имя файла (по умолчанию генерируется)
+        :return: публичная ссылка на файл
+        """
+        file_name = os.path.basename(file_name or self._generate_file_name())
+        await asyncio.to_thread(self._write, stream, file_name)
+        return f'{self._public_url}{self.route_prefix}{file_name}'
+
+    def register(self, supervisor: Supervisor) -> None:
+        """
+        Раздача изображений HTTP сервером супервизора
+        :param supervisor: супервизор процесса
+        """
+        supervisor.web_app.router.add_static(self.route_prefix, self._directory)
+
+    async def _list_outdated(self, cutoff: datetime) -> List[str]:
+        """
+        Список файлов, изменённых раньше cutoff
+        :param cutoff: граница (UTC)
+        :return: имена файлов
+        """
+        def scan() -> List[str]:
+            with os.scandir(self._directory) as entries:
+                return [x.name for x in entries if x.is_file() and not x.name.endswith('.tmp') and x.stat().st_mtime < cutoff.timestamp()]
+
+        return await asyncio.to_thread(scan)
+
+    async def _delete(self, ids: List[str]) -> None:
+        """
+        Удаляет файлы
+        :param ids: имена файлов
+        """
+        def delete() -> None:
+            for name in ids:
+                try:
+                    os.remove(os.path.join(self._directory, name))
+                except FileNotFoundError:
+                    pass
+
+        await asyncio.to_thread(delete)
+
+    def _write(self, stream: BinaryIO, file_name: str) -> None:
+        """
+        Запись файла через временный файл, чтобы по ссылке никогда не отдавался недописанный файл
+        :param stream: файловый объект
+        :param file_name: имя файла
+        """
+        path = os.path.join(self._directory, file_name)
+        with open(path + '.tmp', 'wb') as file:
+            shutil.copyfileobj(stream, file, self.chunk_size)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,81 @@
+import asyncio
+import tempfile
+from typing import BinaryIO, AsyncIterator
+
+from telebot import asyncio_helper
+
+
+class MediaTransfer:
+    """
+    Потоковая передача файлов из Telegram в хранилище без загрузки файла целиком в память
+    """
+
+    _telegram_token: str
+    """Токен telegram бота"""
+
+    chunk_size: int
+    """Размер блока, которым читается и отправляется файл (байт)"""
+
+    spool_threshold: int
+    """Размер файла, после которого он сбрасывается из памяти во временный файл на диске (байт).
+    Запись на диск выполняется в отдельном потоке, чтобы большие вложения не блокировали event loop"""
+
+    def __init__(self, telegram_token: str, chunk_size: int = 64 * 1024, spool_threshold: int = 1024 * 1024):
+        """
+        Конструктор
+        :param telegram_token: токен telegram бота
+        :param chunk_size: размер блока чтения (байт)
+        :param spool_threshold: порог, после которого файл хранится на диске (байт)
+        """
+        self._telegram_token = telegram_token
+        self.chunk_size = chunk_size
+        self.spool_threshold = spool_threshold
+
+    async def download(self, file_path: str) -> BinaryIO:
+        """
+        Скачивает файл из Telegram по частям
+        :param file_path: путь к файлу, полученный из get_file
+        :return: файловый объект, установленный на начало (закрывается вызывающей стороной)
+        :raises ApiHTTPException: если Telegram вернул ошибку
+        """
+        if asyncio_helper.FILE_URL is None:
+            url = "https://api.telegram.org/file/bot{0}/{1}".format(self._telegram_token, file_path)
+        else:
+            url = asyncio_helper.FILE_URL.format(self._telegram_token, file_path)
+
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
+        try:
+            # используем сессию telebot, чтобы не открывать новое соединение с Telegram
+            session = await asyncio_helper.session_manager.get_session()
+            async with session.get(url, proxy=asyncio_helper.proxy) as response:
+                if response.status != 200:
+                    raise asyncio_helper.ApiHTTPException('Download file', response)
+
+                written = 0
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    written += len(chunk)
+                    if written <= self.spool_threshold:
+                        spool.write(chunk)
+                    else:
+                        # файл уже на диске (или сбрасывается на диск этой записью)
+                        await asyncio.to_thread(spool.write, chunk)
+        except BaseException:
+            spool.close()
+            raise
+
+        spool.seek(0)
+        return spool
+
+    @staticmethod
+    async def iter_chunks(stream: BinaryIO, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """
+        Читает файловый объект блоками для потоковой отправки (чтение - в отдельном потоке, файл может быть на диске)
+        :param stream: файловый объект
+        :param chunk_size: размер блока (байт)
+        :return: асинхронный итератор блоков
+        """
+        while True:
+            chunk = await asyncio.to_thread(stream.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
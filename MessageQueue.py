@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты: не более rate операций в секунду с накоплением до capacity
+    """
+
+    rate: float
+    """Скорость пополнения (операций в секунду)"""
+
+    capacity: float
+    """Максимальное количество накопленных операций"""
+
+    _tokens: float
+    """Доступные операции"""
+
+    _updated_at: float
+    """Время последнего пополнения (time.monotonic)"""
+
+    _blocked_until: float
+    """До этого времени разрешения не выдаются (time.monotonic)"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Конструктор
+        :param rate: скорость пополнения (операций в секунду)
+        :param capacity: максимальное количество накопленных операций
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0
+
+    @property
+    def is_full(self) -> bool:
+        """Накоплен ли полный запас (ограничитель можно удалить без потери состояния)"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self) -> None:
+        """Дождаться разрешения на одну операцию"""
+        while True:
+            blocked_for = self._blocked_until - time.monotonic()
+            if blocked_for > 0:
+                await asyncio.sleep(blocked_for)
+                continue
+
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def block(self, seconds: float) -> None:
+        """
+        Приостановить выдачу разрешений (накопленный запас сгорает, пополнение начнётся после паузы)
+        :param seconds: длительность паузы (секунды)
+        """
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self._updated_at = self._blocked_until
+
+    def _refill(self) -> None:
+        """Пополнить запас по прошедшему времени"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + max(now - self._updated_at, 0) * self.rate)
+        self._updated_at = max(now, self._updated_at)
+
+
+class OutgoingMessage:
+    """
+    Исходящий запрос к Telegram в очереди
+    """
+
+    call: Callable[[], Awaitable[Any]]
+    """Функция, выполняющая запрос"""
+
+    coalesce_key: str | None
+    """Ключ объединения: более старый ожидающий запрос с тем же ключом отменяется"""
+
+    future: asyncio.Future
+    """Результат запроса (None, если запрос был заменён более новым)"""
+
+    def __init__(self, call: Callable[[], Awaitable[Any]], coalesce_key: str | None):
+        self.call = call
+        self.coalesce_key = coalesce_key
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class MessageQueue:
+    """
+    Очередь исходящих сообщений с учётом ограничений Telegram (~30 сообщений в секунду всего и ~1 в секунду на чат)
+    и автоматическим ожиданием retry_after при ответе 429 (пауза действует на все чаты)
+    """
+
+    max_retries: int
+    """Количество повторов при ответе 429"""
+
+    _bot: AsyncTeleBot
+    """Бот"""
+
+    _global_bucket: TokenBucket
+    """Общий ограничитель"""
+
+    _chat_rate: float
+    """Скорость отправки в один чат (сообщений в секунду)"""
+
+    _chat_burst: float
+    """Количество сообщений, которые можно отправить в чат подряд"""
+
+    _chat_buckets: Dict[int, TokenBucket]
+    """Ограничители по чатам"""
+
+    _queues: Dict[int, Deque[OutgoingMessage]]
+    """Ожидающие сообщения по чатам"""
+
+    _workers: Dict[int, asyncio.Task]
+    """Отправители по чатам (существуют, пока в очереди чата есть сообщения)"""
+
+    def __init__(self, bot: AsyncTeleBot, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3, max_retries: int = 5):
+        """
+        Конструктор
+        :param bot: бот
+        :param global_rate: общий лимит (сообщений в секунду)
+        :param chat_rate: лимит на чат (сообщений в секунду)
+        :param chat_burst: количество сообщений, которые можно отправить в чат подряд
+        :param max_retries: количество повторов при ответе 429
+        """
+        self._bot = bot
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._queues = {}
+        self._workers = {}
+
+    def send_message(self, chat_id: int, text: str, coalesce_key: str | None = None, **kwargs) -> asyncio.Future:
+        """
+        Поставить сообщение в очередь
+        :param chat_id: ID чата
+        :param text: текст сообщения
+        :param coalesce_key: ключ объединения (например, 'prompt' для подсказок диалога)
+        :param kwargs: остальные параметры send_message
+        :return: future с отправленным сообщением
+        """
+        return self.submit(chat_id, lambda: self._bot.send_message(chat_id, text, **kwargs), coalesce_key)
+
+    def edit_message_text(self, text: str, chat_id: int, message_id: int, **kwargs) -> asyncio.Future:
+        """
+        Поставить изменение сообщения в очередь (более старые изменения того же сообщения отменяются)
+        :param text: новый текст
+        :param chat_id: ID чата
+        :param message_id: ID сообщения
+        :param kwargs: остальные параметры edit_message_text
+        :return: future с изменённым сообщением
+        """
+        return self.submit(chat_id, lambda: self._bot.edit_message_text(text, chat_id, message_id, **kwargs), f'edit:{message_id}')
+
+    def submit(self, chat_id: int, call: Callable[[], Awaitable[Any]], coalesce_key: str | None = None) -> asyncio.Future:
+        """
+        Поставить произвольный запрос к Telegram в очередь чата
+        :param chat_id: ID чата
+        :param call: функция, выполняющая запрос
+        :param coalesce_key: ключ объединения
+        :return: future с результатом запроса
+        """
+        queue = self._queues.setdefault(chat_id, deque())
+
+        if coalesce_key is not None:
+            for pending in [x for x in queue if x.coalesce_key == coalesce_key]:
+                queue.remove(pending)
+                if not pending.future.done():
+                    pending.future.set_result(None)
+
+        message = OutgoingMessage(call, coalesce_key)
+        # ошибки уже залогированы отправителем, вызывающему не обязательно ждать результат
+        message.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        queue.append(message)
+
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+
+        return message.future
+
+    @property
+    def pending(self) -> int:
+        """Количество ожидающих сообщений"""
+        return sum(len(x) for x in self._queues.values())
+
+    async def drain(self) -> None:
+        """Дождаться отправки всех ожидающих сообщений"""
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def _worker(self, chat_id: int) -> None:
+        """
+        Последовательная отправка сообщений одного чата
+        :param chat_id: ID чата
+        """
+        queue = self._queues[chat_id]
+        bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(self._chat_rate, self._chat_burst))
+        try:
+            while queue:
+                await self._deliver(queue.popleft(), bucket)
+        finally:
+            del self._workers[chat_id]
+            if not queue:
+                del self._queues[chat_id]
+            self._forget_idle_buckets()
+
+    async def _deliver(self, message: OutgoingMessage, bucket: TokenBucket) -> None:
+        """
+        Отправка одного сообщения с соблюдением лимитов и повтором после retry_after
+        :param message: сообщение
+        :param bucket: ограничитель чата
+        """
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self._global_bucket.acquire()
+
+            try:
+                result = await message.call()
+            except ApiTelegramException as e:
+                if message.future.done():
+                    return
+                if e.error_code == 429 and attempt < self.max_retries:
+                    retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                    logging.log(logging.WARNING, f'Превышен лимит Telegram, повтор через {retry_after} с')
+                    # лимит общий для бота: остальные чаты тоже ждут, иначе они продолжат получать 429
+                    self._global_bucket.block(retry_after)
+                    await asyncio.sleep(retry_after)
+                    continue
+
+                logging.log(logging.ERROR, f'Ошибка отправки сообщения: {e}')
+                message.future.set_exception(e)
+            except Exception as e:
+                logging.log(logging.ERROR, f'Ошибка отправки сообщения: {e}')
+                if not message.future.done():
+                    message.future.set_exception(e)
+            else:
+                if not message.future.done():
+                    message.future.set_result(result)
+            return
+
+    def _forget_idle_buckets(self) -> None:
+        """Удалить ограничители чатов без очереди, которые полностью восстановились"""
+        for chat_id in [x for x, bucket in self._chat_buckets.items() if x not in self._workers and bucket.is_full]:
+            del self._chat_buckets[chat_id]
@@ -1,9 +1,20 @@
-from typing import Union, List, Tuple
+import asyncio
+import time
+from typing import NamedTuple, Union, List, Tuple
 
 from notion_client import APIResponseError
 from notion_client import AsyncClient
 
 
+class MaterialSchema(NamedTuple):
+    """
+    Неизменяемый снимок схемы таблицы материалов
+    """
+
+    content_types: Tuple[str, ...]
+    categories: Tuple[str, ...]
+
+
 class NotionItem:
     """
     Элемент таблицы Notion
@@ -46,22 +57,49 @@ class NotionItem:
     Подробное описание элемента (может отсутствовать)
     """
 
+    theses_task: asyncio.Task | None = None
+    """
+    Незавершённое получение пересказа материала (дописывается в страницу после сохранения)
+    """
+
     _notion_client: AsyncClient | None = None
     """
-    Клиент Notion
+    Клиент Notion (общий для всех элементов, чтобы переиспользовать соединение)
+    """
+
+    _schema_cache: MaterialSchema | None = None
+    """
+    Кэш типов контента и категорий таблицы
+    """
+
+    _schema_cached_at: float = 0.0
+    """
+    Время заполнения кэша схемы (time.monotonic)
+    """
+
+    schema_ttl: float = 5 * 60
+    """
+    Время жизни кэша схемы (секунды)
+    """
+
+    notion_base_url: str | None = None
+    """
+    Адрес Notion API (None - адрес по умолчанию; меняется для тестового сервера)
     """
 
-    def _get_notion_client(self, notion_token: str) -> AsyncClient:
+    @classmethod
+    def _get_notion_client(cls, notion_token: str) -> AsyncClient:
         """
         Получить клиент Notion
         :param notion_token: токен для доступа к Notion
         :return: клиент Notion
         """
-        if self._notion_client is None:
-            self._notion_client = AsyncClient(auth=notion_token)
-        return self._notion_client
+        if NotionItem._notion_client is None:
+            options = {'base_url': cls.notion_base_url} if cls.notion_base_url else {}
+            NotionItem._notion_client = AsyncClient(auth=notion_token, **options)
+        return NotionItem._notion_client
 
-    async def add_item_to_notion(self, notion_token: str, database_id: str) -> None:
+    async def add_item_to_notion(self, notion_token: str, database_id: str) -> dict:
         """
         Сохраняет элемент в таблицу Notion
 
@@ -73,7 +111,7 @@ class NotionItem:
         """
         try:
             notion = self._get_notion_client(notion_token)
-            await notion.pages.create(
+            return await notion.pages.create(
                 parent={
                     "type": "database_id",
                     "database_id": database_id
@@ -121,18 +159,68 @@ class NotionItem:
         except APIResponseError as error:
             raise error
 
-    async def get_content_types_and_categories(self, notion_token: str, database_id: str) -> Tuple[List[str], List[str]]:
+    @classmethod
+    async def append_paragraph(cls, notion_token: str, page_id: str, text: str) -> None:
         """
-        Получить списки типов контента и категорий
+        Дописывает абзац в конец существующей страницы
+        :param notion_token: токен для доступа к Notion
+        :param page_id: ID страницы
+        :param text: текст абзаца
+        :raises APIResponseError: если не удалось обратиться к Notion API
+        """
+        notion = cls._get_notion_client(notion_token)
+        # Разбиваем текст на части по 2000 символов (ограничение Notion на длину текста)
+        text_parts = [text[i:i + 2000] for i in range(0, len(text), 2000)]
+        await notion.blocks.children.append(
+            page_id,
+            children=[
+                {
+                    "object": "block",
+                    "paragraph": {
+                        "rich_text": [
+                            {
+                                "text": {
+                                    "content": part
+                                }
+                            }
+                        ],
+                        "color": "default"
+                    }
+                }
+                for part in text_parts
+            ]
+        )
+
+    @classmethod
+    async def get_schema(cls, notion_token: str, database_id: str) -> MaterialSchema:
+        """
+        Получить снимок схемы таблицы (из кэша, если он ещё не устарел).
+        Снимок неизменяемый, поэтому его можно хранить и использовать параллельно без копирования
         :param notion_token: токен для доступа к Notion
         :param database_id: id таблицы
-        :return: кортеж с типами контента и категориями
+        :return: типы контента и категории
         """
-        notion = self._get_notion_client(notion_token)
+        if NotionItem._schema_cache is not None and time.monotonic() - NotionItem._schema_cached_at < cls.schema_ttl:
+            return NotionItem._schema_cache
+
+        notion = cls._get_notion_client(notion_token)
         db_object = await notion.databases.retrieve(database_id)
 
         content_types = db_object['properties']['content_type']['select']['options']
         categories = db_object['properties']['category']['select']['options']
 
-        return list(map(lambda x: x['name'], content_types)), list(map(lambda x: x['name'], categories))
+        NotionItem._schema_cache = MaterialSchema(tuple(x['name'] for x in content_types), tuple(x['name'] for x in categories))
+        NotionItem._schema_cached_at = time.monotonic()
 
+        return NotionItem._schema_cache
+
+    @classmethod
+    async def get_content_types_and_categories(cls, notion_token: str, database_id: str) -> Tuple[List[str], List[str]]:
+        """
+        Получить списки типов контента и категорий (из кэша, если он ещё не устарел)
+        :param notion_token: токен для доступа к Notion
+        :param database_id: id таблицы
+        :return: кортеж с типами контента и категориями
+        """
+        schema = await cls.get_schema(notion_token, database_id)
+        return list(schema.content_types), list(schema.categories)
@@ -1,4 +1,7 @@
-from typing import Union, List, Tuple
+import asyncio
+import logging
+import time
+from typing import Union, List, Tuple, BinaryIO, Dict, NamedTuple
 
 from notion_client import APIResponseError
 from notion_client import AsyncClient
@@ -17,8 +20,8 @@ class NotionWorkNoteItem:
     description: Union[str, None]
     """Описание задачи"""
 
-    images: Union[List[bytes], None]
-    """Прикрепленные изображения"""
+    images: Union[List[BinaryIO], None]
+    """Прикрепленные изображения (файловые объекты, закрываются после сохранения)"""
 
     is_urgent: bool
     """Срочность задачи"""
@@ -30,11 +33,43 @@ class NotionWorkNoteItem:
     """Крайний срок выполнения задачи (в формате ISO 8601, пока не используется)"""
 
 
+class WorkTask(NamedTuple):
+    """
+    Открытая задача из таблицы рабочих заметок
+    """
+
+    page_id: str
+    name: str
+
+
 class NotionWorkNote:
     """
     Рабочая заметка в Notion
     """
 
+    quadrants: Dict[str, Tuple[bool, bool]] = {
+        'urg_imp': (True, True),
+        'urg_unimp': (True, False),
+        'unurg_imp': (False, True),
+        'unurg_unimp': (False, False)
+    }
+    """Квадранты матрицы Эйзенхауэра: ключ -> (срочность, важность)"""
+
+    tasks_ttl: float = 60
+    """Время, после которого кэш задач обновляется в фоне (секунды)"""
+
+    _tasks_cache: Dict[str, List[WorkTask]]
+    """Кэш открытых задач по квадрантам"""
+
+    _tasks_cached_at: Dict[str, float]
+    """Время заполнения кэша задач по квадрантам (time.monotonic)"""
+
+    _tasks_generation: Dict[str, int]
+    """Поколение кэша задач по квадрантам: меняется при изменении задач, чтобы обновление, начатое раньше, не записало устаревший список"""
+
+    _tasks_refreshing: Dict[str, asyncio.Task]
+    """Фоновые обновления кэша задач по квадрантам"""
+
     _image_store: ImageStore
 
     _notion_client: AsyncClient | None
@@ -46,16 +81,25 @@ class NotionWorkNote:
     _database_id: str
     """Идентификатор базы данных Notion"""
 
-    def __init__(self, notion_token: str, database_id: str, image_store: ImageStore):
+    _base_url: str | None
+    """Адрес Notion API (None - адрес по умолчанию)"""
+
+    def __init__(self, notion_token: str, database_id: str, image_store: ImageStore, base_url: str | None = None):
         """
         Конструктор
         :param notion_token: токен для доступа к Notion
+        :param base_url: адрес Notion API (None - адрес по умолчанию; меняется для тестового сервера)
         """
         self._notion_client = None
         self._notion_token = notion_token
         self._database_id = database_id
+        self._base_url = base_url
         self._get_notion_client(notion_token)
         self._image_store = image_store
+        self._tasks_cache = {}
+        self._tasks_cached_at = {}
+        self._tasks_generation = {}
+        self._tasks_refreshing = {}
 
     def _get_notion_client(self, notion_token: str) -> AsyncClient:
         """
@@ -64,9 +108,19 @@ class NotionWorkNote:
         :return: клиент Notion
         """
         if self._notion_client is None:
-            self._notion_client = AsyncClient(auth=notion_token)
+            options = {'base_url': self._base_url} if self._base_url else {}
+            self._notion_client = AsyncClient(auth=notion_token, **options)
         return self._notion_client
 
+    async def prewarm(self) -> None:
+        """
+        Заранее устанавливает соединения с Notion и хранилищем изображений
+        """
+        await asyncio.gather(
+            self._notion_client.databases.retrieve(self._database_id),
+            self._image_store.prewarm()
+        )
+
     async def add_item_to_notion(self, item: NotionWorkNoteItem) -> None:
         """
         Добавить запись в базу данных Notion
@@ -77,7 +131,7 @@ class NotionWorkNote:
             children = []
 
             if item.images is not None:
-                images = self._get_images(item.images)
+                images = await self._get_images(item.images)
                 if images is not None:
                     children.extend(images)
 
@@ -134,14 +188,134 @@ class NotionWorkNote:
         except APIResponseError as e:
             print("Notion work note add item error", e)
             raise e
+        else:
+            self.invalidate_tasks(self.get_quadrant(item.is_urgent, item.is_important))
+
+    async def get_open_tasks(self, quadrant: str) -> List[WorkTask]:
+        """
+        Получить открытые задачи квадранта.
+        Ответ берётся из кэша; устаревший кэш отдаётся сразу и обновляется в фоне
+        :param quadrant: ключ квадранта (см. quadrants)
+        :return: список открытых задач
+        :raises APIResponseError: если кэша нет и не удалось обратиться к Notion API
+        """
+        if quadrant not in self._tasks_cache:
+            return await self._refresh_tasks(quadrant)
+
+        if time.monotonic() - self._tasks_cached_at[quadrant] >= self.tasks_ttl:
+            self._schedule_tasks_refresh(quadrant)
+
+        return self._tasks_cache[quadrant]
+
+    async def complete_task(self, page_id: str) -> None:
+        """
+        Отметить задачу выполненной
+        :param page_id: ID страницы задачи
+        :raises APIResponseError: если не удалось обратиться к Notion API
+        """
+        await self._notion_client.pages.update(page_id, properties={"Done": {"checkbox": True}})
+
+        # квадрант задачи неизвестен, поэтому начатые обновления всех квадрантов считаются устаревшими
+        for quadrant in self.quadrants:
+            self._tasks_generation[quadrant] = self._tasks_generation.get(quadrant, 0) + 1
+        for quadrant, tasks in self._tasks_cache.items():
+            self._tasks_cache[quadrant] = [x for x in tasks if x.page_id != page_id]
+
+    def invalidate_tasks(self, quadrant: str) -> None:
+        """
+        Сбросить кэш квадранта: следующий запрос задач дождётся свежего списка из Notion
+        :param quadrant: ключ квадранта
+        """
+        self._tasks_generation[quadrant] = self._tasks_generation.get(quadrant, 0) + 1
+        self._tasks_cache.pop(quadrant, None)
+        self._tasks_cached_at.pop(quadrant, None)
+
+    async def run_tasks_refresh_loop(self, interval: float) -> None:
+        """
+        Периодическое обновление кэша задач всех квадрантов
+        :param interval: период обновления (секунды)
+        """
+        while True:
+            for quadrant in self.quadrants:
+                try:
+                    await self._refresh_tasks(quadrant)
+                except Exception as e:
+                    logging.log(logging.ERROR, f'Ошибка обновления кэша задач: {e}')
+
+            await asyncio.sleep(interval)
+
+    def _schedule_tasks_refresh(self, quadrant: str) -> None:
+        """
+        Запустить фоновое обновление кэша квадранта, если оно ещё не идёт
+        :param quadrant: ключ квадранта
+        """
+        refreshing = self._tasks_refreshing.get(quadrant)
+        if refreshing is None or refreshing.done():
+            self._tasks_refreshing[quadrant] = asyncio.create_task(self._refresh_tasks_in_background(quadrant))
+
+    async def _refresh_tasks_in_background(self, quadrant: str) -> None:
+        """
+        Фоновое обновление кэша квадранта (ошибки только логируются)
+        :param quadrant: ключ квадранта
+        """
+        try:
+            await self._refresh_tasks(quadrant)
+        except Exception as e:
+            logging.log(logging.ERROR, f'Ошибка обновления кэша задач: {e}')
+
+    async def _refresh_tasks(self, quadrant: str) -> List[WorkTask]:
+        """
+        Загрузить открытые задачи квадранта из Notion (с фильтрацией на стороне Notion и постраничным чтением).
+        Если за время загрузки задачи квадранта изменились, результат не попадает в кэш
+        :param quadrant: ключ квадранта
+        :return: список открытых задач
+        """
+        generation = self._tasks_generation.get(quadrant, 0)
+        is_urgent, is_important = self.quadrants[quadrant]
+        query = {
+            "filter": {
+                "and": [
+                    {"property": "Urgent", "checkbox": {"equals": is_urgent}},
+                    {"property": "Important", "checkbox": {"equals": is_important}},
+                    {"property": "Done", "checkbox": {"equals": False}}
+                ]
+            },
+            "sorts": [{"timestamp": "created_time", "direction": "ascending"}],
+            "page_size": 100
+        }
+
+        tasks = []
+        while True:
+            response = await self._notion_client.databases.query(self._database_id, **query)
+            for page in response['results']:
+                name = ''.join(x['plain_text'] for x in page['properties']['Task']['title'])
+                tasks.append(WorkTask(page['id'], name or '-'))
+
+            if not response.get('has_more'):
+                break
+            query['start_cursor'] = response['next_cursor']
+
+        if self._tasks_generation.get(quadrant, 0) == generation:
+            self._tasks_cache[quadrant] = tasks
+            self._tasks_cached_at[quadrant] = time.monotonic()
+        return tasks
+
+    def get_quadrant(self, is_urgent: bool, is_important: bool) -> str:
+        """
+        Получить ключ квадранта по срочности и важности
+        :param is_urgent: срочность
+        :param is_important: важность
+        :return: ключ квадранта
+        """
+        return next(key for key, value in self.quadrants.items() if value == (is_urgent, is_important))
 
-    def _get_images(self, images: List[bytes] | None) -> List[dict] | None:
+    async def _get_images(self, images: List[BinaryIO] | None) -> List[dict] | None:
         """
         Получить изображения в формате Notion
         :param images: изображения
         :return: изображения в формате Notion
         """
-        links = self._upload_images(images)
+        links = await self._upload_images(images)
         if links is not None:
             return [
                 {
@@ -159,7 +333,7 @@ class NotionWorkNote:
         else:
             return None
 
-    def _upload_images(self, images: List[bytes] | None) -> List[str] | None:
+    async def _upload_images(self, images: List[BinaryIO] | None) -> List[str] | None:
         """
         Добавить изображения
         :param images: список изображений
@@ -167,7 +341,7 @@ class NotionWorkNote:
         """
         if images is not None:
             try:
-                return self._image_store.upload_images(images)
+                return await self._image_store.upload_images(images)
             except Exception as e:
                 print("Notion work note upload images error", e)
                 return None
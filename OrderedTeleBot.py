@@ -0,0 +1,116 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+
+class OrderedTeleBot(AsyncTeleBot):
+    """
+    AsyncTeleBot, который обрабатывает обновления одного чата строго по очереди (почтовый ящик на чат),
+    а обновления разных чатов - параллельно, не больше max_concurrency одновременно
+    """
+
+    max_concurrency: int
+    """Максимальное количество одновременно обрабатываемых обновлений (по всем чатам)"""
+
+    _semaphore: asyncio.Semaphore
+    """Общий лимит параллельной обработки"""
+
+    _mailboxes: Dict[int, Deque[types.Update]]
+    """Необработанные обновления по чатам"""
+
+    _workers: Dict[int, asyncio.Task]
+    """Обработчики почтовых ящиков (существуют, пока в ящике есть обновления)"""
+
+    _unordered: set
+    """Обработка обновлений без чата (ссылки нужны, чтобы задачи не были собраны сборщиком мусора)"""
+
+    def __init__(self, token: str, max_concurrency: int = 64, **kwargs):
+        """
+        Конструктор
+        :param token: токен telegram бота
+        :param max_concurrency: максимальное количество одновременно обрабатываемых обновлений
+        :param kwargs: остальные параметры AsyncTeleBot
+        """
+        super().__init__(token, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._mailboxes = {}
+        self._workers = {}
+        self._unordered = set()
+
+    async def process_new_updates(self, updates: List[types.Update]) -> None:
+        """
+        Раскладывает обновления по почтовым ящикам чатов и сразу возвращает управление
+        :param updates: обновления
+        """
+        for update in updates:
+            chat_id = self._get_chat_id(update)
+
+            if chat_id is None:
+                task = asyncio.create_task(self._process(update))
+                self._unordered.add(task)
+                task.add_done_callback(self._unordered.discard)
+                continue
+
+            self._mailboxes.setdefault(chat_id, deque()).append(update)
+            if chat_id not in self._workers:
+                self._workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+
+    @property
+    def pending(self) -> int:
+        """Количество необработанных обновлений"""
+        return sum(len(x) for x in self._mailboxes.values())
+
+    async def drain(self) -> None:
+        """Дождаться обработки всех полученных обновлений"""
+        while self._workers or self._unordered:
+            await asyncio.gather(*self._workers.values(), *self._unordered, return_exceptions=True)
+
+    async def _worker(self, chat_id: int) -> None:
+        """
+        Последовательная обработка почтового ящика чата
+        :param chat_id: ID чата
+        """
+        mailbox = self._mailboxes[chat_id]
+        try:
+            while mailbox:
+                await self._process(mailbox.popleft())
+        finally:
+            del self._workers[chat_id]
+            if not mailbox:
+                del self._mailboxes[chat_id]
+
+    async def _process(self, update: types.Update) -> None:
+        """
+        Обработка одного обновления в пределах общего лимита
+        :param update: обновление
+        """
+        async with self._semaphore:
+            # ошибки обработчиков telebot перехватывает и логирует сам
+            await super().process_new_updates([update])
+
+    @staticmethod
+    def _get_chat_id(update: types.Update) -> int | None:
+        """
+        Чат, к которому относится обновление
+        :param update: обновление
+        :return: ID чата (для инлайн-запросов - ID пользователя) или None, если порядок не важен
+        """
+        message = update.message or update.edited_message or update.channel_post or update.edited_channel_post
+        if message is not None:
+            return message.chat.id
+
+        if update.callback_query is not None:
+            if update.callback_query.message is not None:
+                return update.callback_query.message.chat.id
+            return update.callback_query.from_user.id
+
+        # результат инлайн-запроса сохраняется от имени пользователя, как и его личные сообщения
+        query = update.inline_query or update.chosen_inline_result
+        if query is not None:
+            return query.from_user.id
+
+        return None
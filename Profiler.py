@@ -0,0 +1,304 @@
+import asyncio
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+import zipfile
+from collections import Counter
+from typing import Callable, List, Tuple
+
+
+class LoopLagMonitor:
+    """
+    Замер задержки event loop: насколько позже запланированного просыпается задача с коротким sleep
+    """
+
+    interval: float
+    """Период замера (секунды)"""
+
+    samples: List[float]
+    """Задержки (секунды)"""
+
+    _task: asyncio.Task | None
+    """Задача замера"""
+
+    def __init__(self, interval: float = 0.01):
+        """
+        Конструктор
+        :param interval: период замера (секунды)
+        """
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    def start(self) -> None:
+        """Начать замер (предыдущие результаты сбрасываются)"""
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> List[float]:
+        """
+        Остановить замер
+        :return: задержки (секунды)
+        """
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        return self.samples
+
+    async def _run(self) -> None:
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started_at - self.interval))
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик: отдельный поток периодически снимает стек потока event loop.
+    Стек снимается независимо от того, занят поток вычислениями или ждёт ввода-вывода, поэтому профиль показывает
+    и процессорное, и реальное время
+    """
+
+    interval: float
+    """Период снятия стека (секунды)"""
+
+    stacks: Counter
+    """Количество выборок по стекам (кадры через ';', от внешнего к внутреннему)"""
+
+    _thread_id: int
+    """Профилируемый поток"""
+
+    _stopping: threading.Event
+    """Сигнал остановки"""
+
+    _thread: threading.Thread | None
+    """Поток профилировщика"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        Конструктор
+        :param thread_id: ID профилируемого потока (threading.get_ident)
+        :param interval: период снятия стека (секунды)
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = thread_id
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Запустить поток профилировщика"""
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        """
+        Остановить поток профилировщика
+        :return: количество выборок по стекам
+        """
+        self._stopping.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{getattr(code, "co_qualname", code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+
+class SlowStepRecorder:
+    """
+    Замер шагов event loop (обратных вызовов и шагов корутин), которые дольше порога не возвращали управление.
+    На время замера подменяет asyncio.Handle._run, через который event loop вызывает каждый шаг.
+    Работает только со стандартным event loop asyncio: uvloop и другие реализации вызывают шаги сами
+    """
+
+    threshold: float
+    """Шаг дольше этого времени считается медленным (секунды)"""
+
+    records: List[Tuple[str, float]]
+    """Медленные шаги: (корутина или обратный вызов, длительность в секундах)"""
+
+    _original_run: Callable | None
+    """Исходный Handle._run"""
+
+    def __init__(self, threshold: float = 0.05):
+        """
+        Конструктор
+        :param threshold: порог медленного шага (секунды)
+        """
+        self.threshold = threshold
+        self.records = []
+        self._original_run = None
+
+    @staticmethod
+    def is_supported(loop: asyncio.AbstractEventLoop) -> bool:
+        """
+        Проверка, что event loop вызывает шаги через asyncio.Handle._run
+        :param loop: event loop
+        :return: можно ли замерять шаги этого event loop
+        """
+        return isinstance(loop, asyncio.BaseEventLoop)
+
+    def start(self) -> None:
+        """Начать замер"""
+        original_run = self._original_run = asyncio.Handle._run
+        recorder = self
+
+        def _run(handle: asyncio.Handle) -> None:
+            started_at = time.perf_counter()
+            try:
+                original_run(handle)
+            finally:
+                duration = time.perf_counter() - started_at
+                if duration >= recorder.threshold:
+                    recorder.records.append((_describe_callback(handle._callback), duration))
+
+        asyncio.Handle._run = _run
+
+    def stop(self) -> List[Tuple[str, float]]:
+        """
+        Остановить замер
+        :return: медленные шаги
+        """
+        asyncio.Handle._run = self._original_run
+        return self.records
+
+
+def _describe_callback(callback: Callable) -> str:
+    """
+    Название шага для отчёта
+    :param callback: обратный вызов Handle
+    :return: имя корутины, если это шаг задачи, иначе имя функции
+    """
+    owner = getattr(callback, '__self__', None)
+    if isinstance(owner, asyncio.Task):
+        coroutine = owner.get_coro()
+        return getattr(coroutine, '__qualname__', repr(coroutine))
+    return getattr(callback, '__qualname__', repr(callback))
+
+
+class Profiler:
+    """
+    Профилирование работающего бота по запросу: сэмплирование стека event loop, задержка event loop
+    и медленные шаги корутин за заданное окно. Вне окна ничего не установлено и не работает
+    """
+
+    sample_interval: float = 0.005
+    """Период снятия стека (секунды)"""
+
+    slow_step_duration: float = 0.05
+    """Шаг корутины дольше этого времени считается медленным (секунды)"""
+
+    top: int = 25
+    """Количество строк в разделах отчёта"""
+
+    _running: bool
+    """Выполняется ли профилирование"""
+
+    def __init__(self):
+        self._running = False
+
+    @property
+    def is_running(self) -> bool:
+        """Выполняется ли профилирование"""
+        return self._running
+
+    async def profile(self, duration: float) -> bytes:
+        """
+        Профилирование в течение duration секунд
+        :param duration: длительность окна (секунды)
+        :return: zip-архив: profile.folded (свёрнутые стеки для flamegraph.pl / speedscope) и report.txt
+        :raises RuntimeError: если профилирование уже выполняется
+        """
+        if self._running:
+            raise RuntimeError('Профилирование уже запущено')
+        self._running = True
+
+        loop = asyncio.get_running_loop()
+        sampler = SamplingProfiler(threading.get_ident(), self.sample_interval)
+        lag_monitor = LoopLagMonitor()
+        slow_steps = SlowStepRecorder(self.slow_step_duration) if SlowStepRecorder.is_supported(loop) else None
+
+        if slow_steps is not None:
+            slow_steps.start()
+        sampler.start()
+        lag_monitor.start()
+        started_at = time.perf_counter()
+
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            lags = await lag_monitor.stop()
+            stacks = sampler.stop()
+            slow_records = slow_steps.stop() if slow_steps is not None else None
+            self._running = False
+
+        report = self._build_report(time.perf_counter() - started_at, stacks, lags, slow_records, type(loop))
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as file:
+            file.writestr('profile.folded', ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common()))
+            file.writestr('report.txt', report)
+        return archive.getvalue()
+
+    def _build_report(self, duration: float, stacks: Counter, lags: List[float], slow_steps: List[Tuple[str, float]] | None,
+                      loop_type: type) -> str:
+        """
+        Текстовый отчёт
+        :param duration: фактическая длительность окна (секунды)
+        :param stacks: количество выборок по стекам
+        :param lags: задержки event loop (секунды)
+        :param slow_steps: медленные шаги: (корутина или обратный вызов, длительность); None - замер недоступен
+        :param loop_type: класс event loop
+        :return: текст отчёта
+        """
+        samples = sum(stacks.values())
+        lines = [f'Окно: {duration:.1f} с, выборок стека: {samples} (каждые {self.sample_interval * 1000:.0f} мс)', '']
+
+        if lags:
+            quantiles = statistics.quantiles(lags, n=100, method='inclusive') if len(lags) > 1 else lags * 99
+            lines.append(f'Задержка event loop: p50 {quantiles[49] * 1000:.1f} мс, p99 {quantiles[98] * 1000:.1f} мс, '
+                         f'max {max(lags) * 1000:.1f} мс ({len(lags)} замеров)')
+            lines.append('')
+
+        self_time = Counter()
+        total_time = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            self_time[frames[-1]] += count
+            for frame in set(frames):
+                total_time[frame] += count
+
+        for title, counter in (('Собственное время (функция на вершине стека)', self_time), ('Общее время (функция в стеке)', total_time)):
+            lines.append(f'{title}:')
+            for frame, count in counter.most_common(self.top):
+                lines.append(f'{count / samples:7.1%}  {frame}')
+            lines.append('')
+
+        lines.append(f'Медленные шаги корутин (дольше {self.slow_step_duration * 1000:.0f} мс без возврата в event loop):')
+        if slow_steps is None:
+            lines.append(f'недоступно для {loop_type.__module__}.{loop_type.__qualname__}: замер работает только со стандартным event loop asyncio, '
+                         f'медленные шаги видны по задержке event loop и профилю')
+            return '\n'.join(lines) + '\n'
+
+        by_coroutine = {}
+        for coroutine, seconds in slow_steps:
+            by_coroutine.setdefault(coroutine, []).append(seconds)
+
+        if not by_coroutine:
+            lines.append('нет')
+        for coroutine, durations in sorted(by_coroutine.items(), key=lambda x: sum(x[1]), reverse=True)[:self.top]:
+            lines.append(f'{len(durations):5} раз, всего {sum(durations) * 1000:8.0f} мс, max {max(durations) * 1000:6.0f} мс  {coroutine}')
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,114 @@
+import difflib
+from typing import List
+
+from NotionItem import NotionItem
+from NotionWorkNote import NotionWorkNoteItem
+
+material_format = '/add <ссылка или -> | <название> | <тип контента> | <категория> | <описание (необязательно)>'
+"""формат быстрого добавления материала"""
+
+work_note_format = '/wn [!] [?] <заголовок>\n<описание (необязательно)>\n\n! - срочная, ? - важная'
+"""формат быстрого добавления задачи"""
+
+
+def match_option(value: str, options: List[str]) -> str | None:
+    """
+    Нечёткий выбор варианта из списка (регистр, префикс, опечатки)
+    :param value: введённое значение
+    :param options: допустимые варианты
+    :return: найденный вариант или None (в том числе для пустого значения)
+    """
+    if not value.strip():
+        return None
+
+    folded = {option.casefold(): option for option in options}
+    value = value.strip().casefold()
+
+    if value in folded:
+        return folded[value]
+
+    prefixed = [option for key, option in folded.items() if key.startswith(value)]
+    if len(prefixed) == 1:
+        return prefixed[0]
+
+    close = difflib.get_close_matches(value, list(folded), n=1, cutoff=0.6)
+    return folded[close[0]] if close else None
+
+
+def parse_material(text: str, content_types: List[str], categories: List[str]) -> NotionItem:
+    """
+    Разбор быстрого добавления материала: <ссылка> | <название> | <тип> | <категория> | <описание>
+    :param text: текст после команды
+    :param content_types: допустимые типы контента (пустой список - без проверки)
+    :param categories: допустимые категории (пустой список - без проверки)
+    :return: элемент таблицы Notion
+    :raises ValueError: если текст не соответствует формату (сообщение можно показать пользователю)
+    """
+    fields = [x.strip() for x in text.split('|', 4)]
+    if len(fields) < 4:
+        raise ValueError(f'Неверный формат. Используйте:\n{material_format}')
+
+    url, name, content_type, category = fields[:4]
+
+    if url in ('', '-'):
+        url = None
+    elif not url.startswith(('http://', 'https://')):
+        raise ValueError(f'Ссылка должна начинаться с http:// или https://: {url}')
+
+    if not name:
+        raise ValueError('Название не может быть пустым')
+
+    if not content_type:
+        raise ValueError('Тип контента не может быть пустым')
+
+    if not category:
+        raise ValueError('Категория не может быть пустой')
+
+    if content_types:
+        matched = match_option(content_type, content_types)
+        if matched is None:
+            raise ValueError(f'Тип контента «{content_type}» не найден. Доступные: {", ".join(content_types)}')
+        content_type = matched
+
+    if categories:
+        matched = match_option(category, categories)
+        if matched is None:
+            raise ValueError(f'Категория «{category}» не найдена. Доступные: {", ".join(categories)}')
+        category = matched
+
+    item = NotionItem()
+    item.url = url
+    item.name = name
+    item.content_type = content_type
+    item.category = category
+    item.description = fields[4] if len(fields) == 5 and fields[4] else None
+
+    return item
+
+
+def parse_work_note(text: str) -> NotionWorkNoteItem:
+    """
+    Разбор быстрого добавления задачи: [!] [?] <заголовок>, описание - со второй строки
+    :param text: текст после команды
+    :return: рабочая заметка
+    :raises ValueError: если заголовок пустой (сообщение можно показать пользователю)
+    """
+    first_line, _, description = text.strip().partition('\n')
+
+    words = first_line.split()
+    flags = set()
+    while words and words[0] in ('!', '?', '!?', '?!'):
+        flags.update(words.pop(0))
+
+    if not words:
+        raise ValueError(f'Заголовок задачи не может быть пустым. Используйте:\n{work_note_format}')
+
+    item = NotionWorkNoteItem()
+    item.name = ' '.join(words)
+    item.description = description.strip() or None
+    item.images = None
+    item.is_urgent = '!' in flags
+    item.is_important = '?' in flags
+    item.deadline = None
+
+    return item
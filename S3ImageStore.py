@@ -0,0 +1,223 @@
+import base64
+import contextlib
+import hashlib
+import hmac
+import mimetypes
+import os
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from typing import AsyncIterator, BinaryIO, Dict, List
+from xml.sax.saxutils import escape
+
+import aiohttp
+from yarl import URL
+
+from ImageStore import ImageStore, ImageStoreCapabilities
+from MediaTransfer import MediaTransfer
+
+S3_NAMESPACE = {'s3': 'http://s3.amazonaws.com/doc/2006-03-01/'}
+"""пространство имён XML ответов S3"""
+
+
+class S3ImageStore(ImageStore):
+    """
+    Хранилище изображений в S3-совместимом сервисе (AWS S3, MinIO, Yandex Object Storage и т.д.).
+    Запросы подписываются AWS Signature V4, адресация path-style: {endpoint}/{bucket}/{key}.
+    Бакет (или префикс) должен быть доступен на чтение анонимно, иначе Notion не сможет показать изображение
+    """
+
+    capabilities = ImageStoreCapabilities(delete_batch_size=1000, max_concurrency=16, can_delete=True)
+
+    key_prefix: str = 'images/'
+    """Префикс ключей изображений в бакете"""
+
+    _endpoint: str
+    """Адрес S3 API"""
+
+    _bucket: str
+    """Бакет"""
+
+    _access_key: str
+    """Ключ доступа"""
+
+    _secret_key: str
+    """Секретный ключ"""
+
+    _region: str
+    """Регион (для подписи)"""
+
+    _public_url: str
+    """Адрес, по которому файлы бакета доступны публично"""
+
+    _session: aiohttp.ClientSession | None
+    """HTTP сессия"""
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, region: str = 'us-east-1', public_url: str | None = None):
+        """
+        Конструктор
+        :param endpoint: адрес S3 API (например, https://storage.yandexcloud.net или http://localhost:9000)
+        :param bucket: бакет
+        :param access_key: ключ доступа
+        :param secret_key: секретный ключ
+        :param region: регион
+        :param public_url: публичный адрес файлов бакета (по умолчанию {endpoint}/{bucket})
+        """
+        self._endpoint = endpoint.rstrip('/')
+        self._bucket = bucket
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+        self._public_url = (public_url or f'{self._endpoint}/{bucket}').rstrip('/')
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает HTTP сессию
+        :return: HTTP сессия
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def upload_stream(self, stream: BinaryIO, file_name: str | None = None) -> str:
+        """
+        Загружает файл потоково, блоками, не держа его целиком в памяти
+        :param stream: файловый объект, установленный на начало
+        :param file_name: имя файла (по умолчанию генерируется)
+        :return: публичная ссылка на загруженный файл
+        """
+        file_name = file_name or self._generate_file_name()
+        key = self.key_prefix + file_name
+
+        # S3 не принимает chunked загрузку без aws-chunked подписи, поэтому размер передаётся заранее
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+
+        headers = {
+            'Content-Length': str(size),
+            'Content-Type': mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+        }
+        async with self._request('PUT', key, headers=headers, data=MediaTransfer.iter_chunks(stream)) as response:
+            response.raise_for_status()
+
+        return f'{self._public_url}/{urllib.parse.quote(key)}'
+
+    async def prewarm(self) -> None:
+        """
+        Заранее устанавливает соединение с S3 API, чтобы первая загрузка не ждала TLS рукопожатия
+        """
+        async with self._request('HEAD', ''):
+            pass
+
+    async def close(self) -> None:
+        """Закрыть HTTP сессию"""
+        if self._session is not None:
+            await self._session.close()
+
+    async def _list_outdated(self, cutoff: datetime) -> List[str]:
+        """
+        Список объектов с префиксом изображений, изменённых раньше cutoff
+        :param cutoff: граница (UTC)
+        :return: ключи объектов
+        """
+        keys = []
+        query = {'list-type': '2', 'prefix': self.key_prefix}
+
+        while True:
+            async with self._request('GET', '', query=query) as response:
+                response.raise_for_status()
+                root = ElementTree.fromstring(await response.read())
+
+            for item in root.findall('s3:Contents', S3_NAMESPACE):
+                last_modified = datetime.fromisoformat(item.findtext('s3:LastModified', namespaces=S3_NAMESPACE).replace('Z', '+00:00'))
+                if last_modified < cutoff:
+                    keys.append(item.findtext('s3:Key', namespaces=S3_NAMESPACE))
+
+            if root.findtext('s3:IsTruncated', namespaces=S3_NAMESPACE) != 'true':
+                return keys
+            query['continuation-token'] = root.findtext('s3:NextContinuationToken', namespaces=S3_NAMESPACE)
+
+    async def _delete(self, ids: List[str]) -> None:
+        """
+        Удаляет объекты одним запросом DeleteObjects
+        :param ids: ключи объектов
+        """
+        body = ('<Delete><Quiet>true</Quiet>' + ''.join(f'<Object><Key>{escape(x)}</Key></Object>' for x in ids) + '</Delete>').encode()
+        headers = {
+            'Content-Type': 'application/xml',
+            'Content-MD5': base64.b64encode(hashlib.md5(body).digest()).decode()
+        }
+        async with self._request('POST', '', query={'delete': ''}, headers=headers, data=body) as response:
+            response.raise_for_status()
+
+    @contextlib.asynccontextmanager
+    async def _request(self, method: str, key: str, query: Dict[str, str] | None = None, headers: Dict[str, str] | None = None,
+                       data: bytes | AsyncIterator[bytes] | None = None) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Подписанный запрос к бакету
+        :param method: HTTP метод
+        :param key: ключ объекта ('' - сам бакет)
+        :param query: параметры запроса
+        :param headers: заголовки
+        :param data: тело запроса (bytes - подписывается хэш тела, поток - UNSIGNED-PAYLOAD)
+        :return: контекстный менеджер ответа
+        """
+        path = '/' + urllib.parse.quote(f'{self._bucket}/{key}' if key else self._bucket, safe='/-_.~')
+        query_string = '&'.join(f'{_quote(k)}={_quote(v)}' for k, v in sorted((query or {}).items()))
+        url = URL(f'{self._endpoint}{path}' + (f'?{query_string}' if query_string else ''), encoded=True)
+
+        if data is None or isinstance(data, bytes):
+            payload_hash = hashlib.sha256(data or b'').hexdigest()
+        else:
+            # тело читается потоково, поэтому его хэш заранее неизвестен
+            payload_hash = 'UNSIGNED-PAYLOAD'
+
+        signed_headers = self._sign(method, url, dict(headers or {}), payload_hash, datetime.now(timezone.utc))
+
+        session = await self._get_session()
+        async with session.request(method, url, headers=signed_headers, data=data) as response:
+            yield response
+
+    def _sign(self, method: str, url: URL, headers: Dict[str, str], payload_hash: str, now: datetime) -> Dict[str, str]:
+        """
+        Подпись запроса AWS Signature V4
+        :param method: HTTP метод
+        :param url: адрес (закодированный)
+        :param headers: заголовки запроса
+        :param payload_hash: SHA-256 тела или UNSIGNED-PAYLOAD
+        :param now: время запроса (UTC)
+        :return: заголовки с подписью
+        """
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = now.strftime('%Y%m%d')
+        scope = f'{date}/{self._region}/s3/aws4_request'
+
+        headers['Host'] = url.raw_host if url.is_default_port() else f'{url.raw_host}:{url.port}'
+        headers['x-amz-content-sha256'] = payload_hash
+        headers['x-amz-date'] = amz_date
+
+        signed = {name.lower(): ' '.join(str(value).split()) for name, value in headers.items() if name.lower() != 'content-length'}
+        signed_names = ';'.join(sorted(signed))
+        canonical_headers = ''.join(f'{name}:{signed[name]}\n' for name in sorted(signed))
+        canonical_query = '&'.join(sorted(x if '=' in x else x + '=' for x in url.raw_query_string.split('&') if x))
+
+        canonical_request = '\n'.join([method, url.raw_path, canonical_query, canonical_headers, signed_names, payload_hash])
+        string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()])
+
+        key = ('AWS4' + self._secret_key).encode()
+        for part in (date, self._region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers['Authorization'] = f'AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, SignedHeaders={signed_names}, Signature={signature}'
+        return headers
+
+
+def _quote(value: str) -> str:
+    """
+    Кодирование параметра запроса по правилам SigV4
+    :param value: значение
+    :return: закодированное значение
+    """
+    return urllib.parse.quote(value, safe='-_.~')
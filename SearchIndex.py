@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, NamedTuple, Tuple
+
+from NotionItem import NotionItem
+
+
+class SearchResult(NamedTuple):
+    """
+    Найденный материал
+    """
+
+    page_id: str
+    name: str
+    url: str | None
+    category: str | None
+    content_type: str | None
+
+
+class SearchIndex:
+    """
+    Локальное полнотекстовое зеркало таблицы материалов Notion (SQLite FTS5).
+    Все запросы к базе выполняются по очереди в отдельном потоке, чтобы синхронизация и поиск не блокировали event loop
+    """
+
+    _connection: sqlite3.Connection
+    """Соединение с базой индекса"""
+
+    _executor: ThreadPoolExecutor
+    """Поток для запросов к базе индекса (один, поэтому запросы не пересекаются на общем соединении)"""
+
+    _notion_token: str
+    """Токен для доступа к Notion"""
+
+    _database_id: str
+    """ID таблицы Notion"""
+
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS materials (
+            id INTEGER PRIMARY KEY,
+            page_id TEXT NOT NULL UNIQUE,
+            name TEXT,
+            url TEXT,
+            category TEXT,
+            content_type TEXT,
+            description TEXT,
+            last_edited_time TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS materials_fts USING fts5(
+            name, url, category, content_type, description,
+            content='materials', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS materials_ai AFTER INSERT ON materials BEGIN
+            INSERT INTO materials_fts(rowid, name, url, category, content_type, description)
+            VALUES (new.id, new.name, new.url, new.category, new.content_type, new.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS materials_ad AFTER DELETE ON materials BEGIN
+            INSERT INTO materials_fts(materials_fts, rowid, name, url, category, content_type, description)
+            VALUES ('delete', old.id, old.name, old.url, old.category, old.content_type, old.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS materials_au AFTER UPDATE ON materials BEGIN
+            INSERT INTO materials_fts(materials_fts, rowid, name, url, category, content_type, description)
+            VALUES ('delete', old.id, old.name, old.url, old.category, old.content_type, old.description);
+            INSERT INTO materials_fts(rowid, name, url, category, content_type, description)
+            VALUES (new.id, new.name, new.url, new.category, new.content_type, new.description);
+        END;
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    '''
+    """Схема базы индекса"""
+
+    def __init__(self, notion_token: str, database_id: str, path: str):
+        """
+        Конструктор
+        :param notion_token: токен для доступа к Notion
+        :param database_id: ID таблицы Notion
+        :param path: путь к файлу базы индекса
+        """
+        self._notion_token = notion_token
+        self._database_id = database_id
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(self._schema)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search_index')
+
+    async def search(self, query: str, offset: int = 0, limit: int = 5) -> Tuple[List[SearchResult], int]:
+        """
+        Поиск по индексу (без обращений к Notion)
+        :param query: поисковый запрос
+        :param offset: смещение страницы результатов
+        :param limit: размер страницы результатов
+        :return: страница результатов и общее количество найденных материалов
+        """
+        match = self._to_match_expression(query)
+        if not match:
+            return [], 0
+
+        return await self._execute(self._search, match, offset, limit)
+
+    async def index_page(self, page: dict, description: str | None) -> None:
+        """
+        Добавляет или обновляет страницу Notion в индексе
+        :param page: объект страницы, полученный от Notion API
+        :param description: текст описания материала
+        """
+        await self._execute(self._index_pages, [(page, description)], None)
+
+    def _search(self, match: str, offset: int, limit: int) -> Tuple[List[SearchResult], int]:
+        """
+        Поиск по индексу (в потоке базы)
+        :param match: выражение MATCH
+        :param offset: смещение страницы результатов
+        :param limit: размер страницы результатов
+        :return: страница результатов и общее количество найденных материалов
+        """
+        total = self._connection.execute('SELECT count(*) FROM materials_fts WHERE materials_fts MATCH ?', (match,)).fetchone()[0]
+        rows = self._connection.execute(
+            '''
+            SELECT m.page_id, m.name, m.url, m.category, m.content_type
+            FROM materials_fts
+            JOIN materials m ON m.id = materials_fts.rowid
+            WHERE materials_fts MATCH ?
+            ORDER BY bm25(materials_fts, 10.0, 2.0, 3.0, 3.0, 1.0)
+            LIMIT ? OFFSET ?
+            ''',
+            (match, limit, offset)
+        ).fetchall()
+
+        return [SearchResult(*row) for row in rows], total
+
+    def _index_pages(self, pages: List[Tuple[dict, str | None]], watermark: str | None) -> None:
+        """
+        Добавляет или обновляет страницы Notion в индексе одной транзакцией (в потоке базы)
+        :param pages: объекты страниц, полученные от Notion API, и тексты их описаний
+        :param watermark: время изменения последней синхронизированной страницы (None - не менять)
+        """
+        rows = []
+        for page, description in pages:
+            properties = page['properties']
+
+            name = ''.join(x['plain_text'] if 'plain_text' in x else x['text']['content'] for x in properties['name']['title'])
+            content_type = properties['content_type']['select']['name'] if properties['content_type']['select'] else None
+            category = properties['category']['select']['name'] if properties['category']['select'] else None
+            url = properties['url']['url']
+            rows.append((page['id'], name, url, category, content_type, description, page['last_edited_time']))
+
+        with self._connection:
+            self._connection.executemany(
+                '''
+                INSERT INTO materials (page_id, name, url, category, content_type, description, last_edited_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(page_id) DO UPDATE SET
+                    name = excluded.name, url = excluded.url, category = excluded.category,
+                    content_type = excluded.content_type, description = excluded.description,
+                    last_edited_time = excluded.last_edited_time
+                ''',
+                rows
+            )
+            if watermark is not None:
+                self._set_state('last_edited_time', watermark)
+
+    async def sync(self, full: bool = False) -> int:
+        """
+        Синхронизирует индекс с таблицей Notion.
+        Инкрементальная синхронизация запрашивает только страницы, изменённые после последней синхронизации,
+        полная - все страницы и удаляет из индекса те, которых больше нет в таблице
+        :param full: выполнить полную синхронизацию
+        :return: количество обновлённых страниц
+        """
+        notion = NotionItem._get_notion_client(self._notion_token)
+        watermark = None if full else await self._execute(self._get_state, 'last_edited_time')
+
+        query = {'page_size': 100, 'sorts': [{'timestamp': 'last_edited_time', 'direction': 'ascending'}]}
+        if watermark:
+            # Notion хранит время изменения с точностью до минуты, поэтому граница включается
+            query['filter'] = {'timestamp': 'last_edited_time', 'last_edited_time': {'on_or_after': watermark}}
+
+        seen_ids = set()
+        updated = 0
+        cursor = None
+        while True:
+            if cursor:
+                query['start_cursor'] = cursor
+            response = await notion.databases.query(self._database_id, **query)
+
+            seen_ids.update(page['id'] for page in response['results'])
+            outdated = await self._execute(self._get_outdated, response['results'])
+
+            # страница ответа Notion записывается одной транзакцией
+            batch = [(page, await self._get_description(page['id'])) for page in outdated]
+            if batch:
+                await self._execute(self._index_pages, batch, batch[-1][0]['last_edited_time'])
+                updated += len(batch)
+
+            if not response.get('has_more'):
+                break
+            cursor = response['next_cursor']
+
+        if full:
+            await self._execute(self._delete_missing, seen_ids)
+
+        return updated
+
+    async def run_sync_loop(self, interval: float, full_sync_interval: float) -> None:
+        """
+        Периодическая синхронизация индекса
+        :param interval: период инкрементальной синхронизации (секунды)
+        :param full_sync_interval: период полной синхронизации (секунды)
+        """
+        while True:
+            full_sync_at = float(await self._execute(self._get_state, 'full_sync_at') or 0)
+            try:
+                await self.sync(full=time.time() - full_sync_at >= full_sync_interval)
+            except Exception as e:
+                logging.log(logging.ERROR, f'Ошибка синхронизации поискового индекса: {e}')
+
+            await asyncio.sleep(interval)
+
+    async def _get_description(self, page_id: str) -> str:
+        """
+        Получить текст описания материала из содержимого страницы
+        :param page_id: ID страницы
+        :return: текст описания
+        """
+        notion = NotionItem._get_notion_client(self._notion_token)
+        blocks = await notion.blocks.children.list(page_id, page_size=100)
+
+        parts = []
+        for block in blocks['results']:
+            if block['type'] == 'paragraph':
+                parts.append(''.join(x['plain_text'] for x in block['paragraph']['rich_text']))
+
+        return '\n'.join(parts)
+
+    async def _execute(self, func: Callable[..., Any], *args) -> Any:
+        """
+        Выполнить функцию в потоке базы
+        :param func: функция, работающая с соединением
+        :param args: аргументы функции
+        :return: результат функции
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _get_outdated(self, pages: List[dict]) -> List[dict]:
+        """
+        Страницы, которых нет в индексе или которые изменились после индексации (в потоке базы)
+        :param pages: объекты страниц, полученные от Notion API
+        :return: страницы, которые нужно проиндексировать
+        """
+        placeholders = ','.join('?' * len(pages))
+        indexed = dict(self._connection.execute(f'SELECT page_id, last_edited_time FROM materials WHERE page_id IN ({placeholders})',
+                                                [page['id'] for page in pages]))
+        return [page for page in pages if indexed.get(page['id']) != page['last_edited_time']]
+
+    def _delete_missing(self, seen_ids: Iterable[str]) -> None:
+        """
+        Удаляет из индекса страницы, которых больше нет в таблице, и запоминает время полной синхронизации (в потоке базы)
+        :param seen_ids: ID всех страниц таблицы
+        """
+        seen_ids = set(seen_ids)
+        with self._connection:
+            known_ids = [row[0] for row in self._connection.execute('SELECT page_id FROM materials')]
+            self._connection.executemany('DELETE FROM materials WHERE page_id = ?', [(x,) for x in known_ids if x not in seen_ids])
+            self._set_state('full_sync_at', str(time.time()))
+
+    def _get_state(self, key: str) -> str | None:
+        """
+        Получить значение состояния синхронизации
+        :param key: ключ
+        :return: значение или None
+        """
+        row = self._connection.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: str) -> None:
+        """
+        Сохранить значение состояния синхронизации (в текущей транзакции вызывающего)
+        :param key: ключ
+        :param value: значение
+        """
+        self._connection.execute('INSERT INTO sync_state (key, value) VALUES (?, ?) '
+                                 'ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, value))
+
+    @staticmethod
+    def _to_match_expression(query: str) -> str:
+        """
+        Преобразует пользовательский запрос в выражение FTS5 (все слова, поиск по префиксу)
+        :param query: поисковый запрос
+        :return: выражение MATCH
+        """
+        return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from aiohttp import web
+
+
+class Service:
+    """
+    Долгоживущая задача под управлением супервизора
+    """
+
+    name: str
+    """Название"""
+
+    factory: Callable[[], Awaitable]
+    """Функция, создающая корутину задачи"""
+
+    restart: bool
+    """Перезапускать ли задачу после завершения или ошибки"""
+
+    stops_intake: bool
+    """Останавливается первой при завершении работы (приём новых обновлений)"""
+
+    status: str
+    """Состояние: starting, running, restarting, finished, failed, stopped"""
+
+    restarts: int
+    """Количество перезапусков"""
+
+    last_error: str | None
+    """Последняя ошибка"""
+
+    task: asyncio.Task | None
+    """Текущая задача"""
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable], restart: bool, stops_intake: bool):
+        self.name = name
+        self.factory = factory
+        self.restart = restart
+        self.stops_intake = stops_intake
+        self.status = 'starting'
+        self.restarts = 0
+        self.last_error = None
+        self.task = None
+
+
+class Job:
+    """
+    Периодическая задача, время последнего запуска которой переживает перезапуск процесса
+    """
+
+    name: str
+    """Название"""
+
+    interval: float
+    """Период запуска (секунды)"""
+
+    func: Callable[[], Awaitable]
+    """Функция, создающая корутину задачи"""
+
+    last_run: float | None
+    """Время последнего запуска (time.time) или None"""
+
+    last_error: str | None
+    """Последняя ошибка"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.last_run = None
+        self.last_error = None
+
+    @property
+    def next_run(self) -> float:
+        """Время следующего запуска (time.time)"""
+        return (self.last_run if self.last_run is not None else time.time()) + self.interval
+
+
+class Supervisor:
+    """
+    Единый asyncio-владелец всех задач процесса: бота, периодических задач и фоновых обработчиков.
+    Перезапускает упавшие задачи, хранит расписание в файле, корректно завершает работу по SIGTERM
+    и отдаёт состояние задач по HTTP (/health)
+    """
+
+    restart_delay: float = 1
+    """Начальная задержка перед перезапуском упавшей задачи (удваивается, до max_restart_delay)"""
+
+    max_restart_delay: float = 60
+    """Максимальная задержка перед перезапуском (секунды)"""
+
+    drain_timeout: float = 20
+    """Сколько ждать завершения текущей работы при остановке (секунды)"""
+
+    web_app: web.Application
+    """HTTP приложение процесса (сюда можно добавлять свои маршруты)"""
+
+    _services: Dict[str, Service]
+    """Долгоживущие задачи"""
+
+    _jobs: Dict[str, Job]
+    """Периодические задачи"""
+
+    _shutdown_hooks: List[Callable[[], Awaitable]]
+    """Действия при остановке (дослать сообщения, закрыть соединения)"""
+
+    _state_path: str
+    """Путь к файлу с расписанием"""
+
+    _http_port: int | None
+    """Порт HTTP сервера (None - сервер не запускается)"""
+
+    _stopping: asyncio.Event | None
+    """Событие остановки"""
+
+    _started_at: float
+    """Время запуска (time.time)"""
+
+    def __init__(self, state_path: str, http_port: int | None = None):
+        """
+        Конструктор
+        :param state_path: путь к файлу, в котором хранится время последних запусков периодических задач
+        :param http_port: порт HTTP сервера с /health (None - не запускать)
+        """
+        self._state_path = state_path
+        self._http_port = http_port
+        self._services = {}
+        self._jobs = {}
+        self._shutdown_hooks = []
+        self._stopping = None
+        self._started_at = time.time()
+
+        self.web_app = web.Application()
+        self.web_app.router.add_get('/health', self._handle_health)
+
+    def add_service(self, name: str, factory: Callable[[], Awaitable], restart: bool = True, stops_intake: bool = False) -> None:
+        """
+        Добавить долгоживущую задачу
+        :param name: название
+        :param factory: функция, создающая корутину задачи
+        :param restart: перезапускать после завершения или ошибки (False - одноразовая задача)
+        :param stops_intake: останавливать первой при завершении работы (например, поллинг)
+        """
+        self._services[name] = Service(name, factory, restart, stops_intake)
+
+    def add_job(self, name: str, interval: float, func: Callable[[], Awaitable]) -> None:
+        """
+        Добавить периодическую задачу
+        :param name: название (ключ в файле расписания)
+        :param interval: период запуска (секунды)
+        :param func: функция, создающая корутину задачи
+        """
+        self._jobs[name] = Job(name, interval, func)
+
+    def add_shutdown_hook(self, func: Callable[[], Awaitable]) -> None:
+        """
+        Добавить действие при остановке (выполняется после остановки приёма обновлений)
+        :param func: функция, создающая корутину
+        """
+        self._shutdown_hooks.append(func)
+
+    def health(self) -> dict:
+        """
+        Состояние процесса
+        :return: словарь с состоянием задач
+        """
+        return {
+            'healthy': all(x.status in ('running', 'finished') for x in self._services.values()),
+            'uptime': round(time.time() - self._started_at),
+            'services': {x.name: {'status': x.status, 'restarts': x.restarts, 'last_error': x.last_error} for x in self._services.values()},
+            'jobs': {x.name: {'last_run': x.last_run, 'next_run': x.next_run, 'last_error': x.last_error} for x in self._jobs.values()}
+        }
+
+    async def run(self) -> None:
+        """Запустить все задачи и работать до SIGTERM/SIGINT"""
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        self._load_state()
+
+        runner = None
+        if self._http_port is not None:
+            runner = web.AppRunner(self.web_app, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, port=self._http_port).start()
+
+        for service in self._services.values():
+            service.task = asyncio.create_task(self._run_service(service), name=service.name)
+        job_tasks = [asyncio.create_task(self._run_job(job), name=job.name) for job in self._jobs.values()]
+
+        await self._stopping.wait()
+        logging.log(logging.WARNING, 'Получен сигнал остановки, завершение работы')
+
+        # сначала перестаём принимать новые обновления, затем доделываем текущую работу
+        await self._stop_services([x for x in self._services.values() if x.stops_intake])
+        for job_task in job_tasks:
+            job_task.cancel()
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*[hook() for hook in self._shutdown_hooks], return_exceptions=True), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logging.log(logging.WARNING, 'Не удалось дождаться завершения текущей работы')
+
+        await self._stop_services([x for x in self._services.values() if not x.stops_intake])
+        await asyncio.gather(*job_tasks, return_exceptions=True)
+
+        if runner is not None:
+            await runner.cleanup()
+
+    def stop(self) -> None:
+        """Запросить остановку"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _stop_services(self, services: List[Service]) -> None:
+        """
+        Остановить задачи
+        :param services: задачи
+        """
+        for service in services:
+            service.restart = False
+            if service.task is not None:
+                service.task.cancel()
+        await asyncio.gather(*[x.task for x in services if x.task is not None], return_exceptions=True)
+
+    async def _run_service(self, service: Service) -> None:
+        """
+        Выполнение задачи с перезапуском после ошибок
+        :param service: задача
+        """
+        delay = self.restart_delay
+        while True:
+            service.status = 'running'
+            started_at = time.monotonic()
+            try:
+                await service.factory()
+            except asyncio.CancelledError:
+                service.status = 'stopped'
+                raise
+            except Exception as e:
+                service.last_error = f'{type(e).__name__}: {e}'
+                logging.log(logging.ERROR, f'Задача {service.name} упала: {service.last_error}')
+                if not service.restart:
+                    service.status = 'failed'
+                    return
+            else:
+                if not service.restart or self._stopping.is_set():
+                    service.status = 'finished'
+                    return
+
+            # задача, проработавшая долго, считается здоровой и перезапускается без накопленной задержки
+            if time.monotonic() - started_at > self.max_restart_delay:
+                delay = self.restart_delay
+
+            service.status = 'restarting'
+            service.restarts += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    async def _run_job(self, job: Job) -> None:
+        """
+        Выполнение периодической задачи по расписанию
+        :param job: задача
+        """
+        if job.last_run is None:
+            job.last_run = time.time()
+            self._save_state()
+
+        while True:
+            await asyncio.sleep(max(0.0, job.next_run - time.time()))
+
+            job.last_run = time.time()
+            self._save_state()
+            try:
+                await job.func()
+            except Exception as e:
+                job.last_error = f'{type(e).__name__}: {e}'
+                logging.log(logging.ERROR, f'Периодическая задача {job.name} завершилась с ошибкой: {job.last_error}')
+            else:
+                job.last_error = None
+
+    def _load_state(self) -> None:
+        """Загрузить время последних запусков периодических задач"""
+        try:
+            with open(self._state_path, encoding='utf-8') as file:
+                state = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+
+        for name, last_run in state.get('jobs', {}).items():
+            if name in self._jobs:
+                self._jobs[name].last_run = last_run
+
+    def _save_state(self) -> None:
+        """Сохранить время последних запусков периодических задач"""
+        temp_path = self._state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'jobs': {x.name: x.last_run for x in self._jobs.values() if x.last_run is not None}}, file)
+        os.replace(temp_path, self._state_path)
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        """
+        GET /health
+        :param request: запрос
+        :return: состояние процесса (200 - всё работает, 503 - есть упавшие задачи)
+        """
+        health = self.health()
+        return web.json_response(health, status=200 if health['healthy'] else 503)
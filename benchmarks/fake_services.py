@@ -0,0 +1,409 @@
+"""
+Локальные заглушки внешних сервисов для нагрузочного теста: Telegram Bot API, Notion API, загрузка ImageKit,
+S3-совместимое хранилище (с проверкой подписи AWS Signature V4), пересказ YandexGPT и страницы со ссылками.
+
+Все сервисы обслуживаются одним aiohttp приложением на одном порту; задержка ответа каждого сервиса настраивается,
+чтобы имитировать сетевое время настоящих API.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import re
+import time
+import urllib.parse
+import uuid
+import xml.etree.ElementTree as ElementTree
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+CONTENT_TYPES = ['Статья', 'Видео', 'Пост']
+"""типы контента в схеме фейковой таблицы материалов"""
+
+CATEGORIES = ['Программирование', 'Архитектура', 'Жизнь']
+"""категории в схеме фейковой таблицы материалов"""
+
+S3_ACCESS_KEY = 'load-test'
+"""ключ доступа фейкового S3"""
+
+S3_SECRET_KEY = 'load-test-secret'
+"""секретный ключ фейкового S3"""
+
+S3_XML_NAMESPACE = 'http://s3.amazonaws.com/doc/2006-03-01/'
+"""пространство имён XML ответов S3"""
+
+
+class FakeServices:
+    """
+    Фейковые Telegram/Notion/ImageKit/S3/YandexGPT на локальном HTTP сервере.
+    Исходящие сообщения бота складываются в очереди по чатам, из которых их читает генератор нагрузки
+    """
+
+    latency: Dict[str, float]
+    """Задержка ответа по сервисам (секунды): telegram, notion, imagekit, s3, yandex, pages"""
+
+    image_size: int
+    """Размер файла, который отдаётся при скачивании фотографии из Telegram (байт)"""
+
+    requests: Dict[str, int]
+    """Количество обработанных запросов по сервисам"""
+
+    uploaded_bytes: int
+    """Сколько байт изображений получено загрузкой ImageKit и S3"""
+
+    s3_objects: Dict[str, Dict[str, Tuple[int, datetime]]]
+    """Объекты S3 по бакетам: ключ -> (размер, время изменения)"""
+
+    s3_list_page_size: int = 100
+    """Сколько объектов S3 отдаётся на странице ListObjectsV2 (меньше, чем у AWS, чтобы проверялось постраничное чтение)"""
+
+    base_url: str | None
+    """Адрес сервера (после запуска)"""
+
+    _replies: Dict[int, asyncio.Queue]
+    """Сообщения, отправленные ботом, по чатам"""
+
+    _message_ids: itertools.count
+    """Счётчик ID сообщений"""
+
+    _image: bytes
+    """Содержимое фотографии"""
+
+    _runner: web.AppRunner | None
+    """HTTP сервер"""
+
+    def __init__(self, latency: Dict[str, float] | None = None, image_size: int = 256 * 1024):
+        """
+        Конструктор
+        :param latency: задержка ответа по сервисам (секунды), не указанные сервисы отвечают сразу
+        :param image_size: размер фотографии (байт)
+        """
+        self.latency = defaultdict(float, latency or {})
+        self.image_size = image_size
+        self.requests = defaultdict(int)
+        self.uploaded_bytes = 0
+        self.s3_objects = defaultdict(dict)
+        self.base_url = None
+        self._replies = defaultdict(asyncio.Queue)
+        self._message_ids = itertools.count(1)
+        self._image = os.urandom(image_size)
+        self._runner = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Запустить сервер
+        :param host: адрес
+        :param port: порт (0 - любой свободный)
+        :return: адрес сервера
+        """
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/bot{token}/{method}', self._handle_telegram)
+        app.router.add_get('/file/bot{token}/{path:.*}', self._handle_telegram_file)
+        app.router.add_get('/v1/databases/{database_id}', self._handle_notion_database)
+        app.router.add_post('/v1/databases/{database_id}/query', self._handle_notion_query)
+        app.router.add_post('/v1/pages', self._handle_notion_create_page)
+        app.router.add_patch('/v1/pages/{page_id}', self._handle_notion_update_page)
+        app.router.add_route('*', '/v1/blocks/{block_id}/children', self._handle_notion_children)
+        app.router.add_route('*', '/imagekit/upload', self._handle_imagekit_upload)
+        app.router.add_route('*', '/s3/{bucket}', self._handle_s3_bucket)
+        app.router.add_put('/s3/{bucket}/{key:.+}', self._handle_s3_put_object)
+        app.router.add_post('/yandex/sharing-url', self._handle_yandex)
+        app.router.add_get('/yandex/share/{id}', self._handle_yandex_share)
+        app.router.add_get('/article/{id}', self._handle_article)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port, backlog=4096).start()
+
+        self.base_url = f'http://{host}:{self._runner.addresses[0][1]}'
+        return self.base_url
+
+    async def stop(self) -> None:
+        """Остановить сервер"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def next_reply(self, chat_id: int, timeout: float) -> dict:
+        """
+        Дождаться следующего сообщения бота в чат
+        :param chat_id: ID чата
+        :param timeout: таймаут (секунды)
+        :return: параметры запроса sendMessage/editMessageText
+        :raises asyncio.TimeoutError: если бот не ответил за отведённое время
+        """
+        return await asyncio.wait_for(self._replies[chat_id].get(), timeout)
+
+    def forget_chat(self, chat_id: int) -> None:
+        """
+        Удалить очередь сообщений чата (после завершения сценария)
+        :param chat_id: ID чата
+        """
+        self._replies.pop(chat_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики запросов
+        :return: количество запросов по сервисам
+        """
+        return dict(self.requests)
+
+    async def _delay(self, service: str) -> None:
+        """
+        Имитация сетевой задержки сервиса
+        :param service: название сервиса
+        """
+        self.requests[service] += 1
+        if self.latency[service] > 0:
+            await asyncio.sleep(self.latency[service])
+
+    async def _handle_telegram(self, request: web.Request) -> web.Response:
+        """Методы Bot API (telebot отправляет параметры формой в теле запроса, в том числе для GET)"""
+        await self._delay('telegram')
+        method = request.match_info['method']
+        params = dict(request.query)
+        if request.content_type == 'multipart/form-data':
+            async for part in await request.multipart():
+                params[part.name] = await part.text() if part.filename is None else await part.read()
+        elif request.can_read_body:
+            params.update(urllib.parse.parse_qsl(await request.text()))
+
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params['chat_id'])
+            self._replies[chat_id].put_nowait({'method': method, 'text': params.get('text', ''), 'received_at': time.perf_counter()})
+            result = {
+                'message_id': int(params.get('message_id') or next(self._message_ids)),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        elif method == 'getFile':
+            result = {'file_id': params['file_id'], 'file_unique_id': params['file_id'], 'file_size': self.image_size,
+                      'file_path': f'photos/{params["file_id"]}.jpg'}
+        elif method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'LoadTestBot', 'username': 'load_test_bot'}
+        else:
+            result = True
+
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _handle_telegram_file(self, request: web.Request) -> web.Response:
+        """Скачивание файла из Telegram"""
+        await self._delay('telegram')
+        return web.Response(body=self._image, content_type='image/jpeg')
+
+    async def _handle_notion_database(self, request: web.Request) -> web.Response:
+        """Схема таблицы"""
+        await self._delay('notion')
+        return web.json_response({
+            'object': 'database',
+            'id': request.match_info['database_id'],
+            'properties': {
+                'content_type': {'select': {'options': [{'name': x} for x in CONTENT_TYPES]}},
+                'category': {'select': {'options': [{'name': x} for x in CATEGORIES]}}
+            }
+        })
+
+    async def _handle_notion_query(self, request: web.Request) -> web.Response:
+        """Запрос страниц таблицы (пустой результат)"""
+        await self._delay('notion')
+        return web.json_response({'object': 'list', 'results': [], 'has_more': False, 'next_cursor': None})
+
+    async def _handle_notion_create_page(self, request: web.Request) -> web.Response:
+        """Создание страницы: возвращаются переданные свойства, как это делает Notion"""
+        await self._delay('notion')
+        body = await request.json()
+        properties = body.get('properties', {})
+        for value in properties.values():
+            for text in value.get('title', []):
+                text['plain_text'] = text['text']['content']
+
+        return web.json_response({
+            'object': 'page',
+            'id': str(uuid.uuid4()),
+            'last_edited_time': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:00.000Z'),
+            'properties': properties
+        })
+
+    async def _handle_notion_update_page(self, request: web.Request) -> web.Response:
+        """Изменение свойств страницы"""
+        await self._delay('notion')
+        return web.json_response({'object': 'page', 'id': request.match_info['page_id'], 'properties': {}})
+
+    async def _handle_notion_children(self, request: web.Request) -> web.Response:
+        """Чтение и дополнение блоков страницы"""
+        await self._delay('notion')
+        if request.can_read_body:
+            await request.read()
+        return web.json_response({'object': 'list', 'results': [], 'has_more': False, 'next_cursor': None})
+
+    async def _handle_imagekit_upload(self, request: web.Request) -> web.Response:
+        """Загрузка файла (multipart читается потоково)"""
+        await self._delay('imagekit')
+        if request.method != 'POST':
+            return web.Response()
+
+        file_name = 'image.jpg'
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == 'file':
+                while chunk := await part.read_chunk():
+                    self.uploaded_bytes += len(chunk)
+            elif part.name == 'fileName':
+                file_name = await part.text()
+
+        return web.json_response({'fileId': str(uuid.uuid4()), 'name': file_name, 'url': f'{self.base_url}/images/{file_name}'})
+
+    async def _handle_s3_put_object(self, request: web.Request) -> web.Response:
+        """S3 PutObject (тело читается потоково)"""
+        await self._delay('s3')
+        error = _check_s3_signature(request, None)
+        if error is not None:
+            return _s3_error(403, error)
+
+        size = 0
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+        if size != request.content_length:
+            return _s3_error(400, 'IncompleteBody')
+
+        self.uploaded_bytes += size
+        self.s3_objects[request.match_info['bucket']][request.match_info['key']] = (size, datetime.now(timezone.utc))
+        return web.Response(headers={'ETag': f'"{uuid.uuid4().hex}"'})
+
+    async def _handle_s3_bucket(self, request: web.Request) -> web.Response:
+        """Запросы к бакету S3: HeadBucket, ListObjectsV2, DeleteObjects"""
+        await self._delay('s3')
+        body = await request.read()
+        error = _check_s3_signature(request, body)
+        if error is not None:
+            return _s3_error(403, error)
+
+        objects = self.s3_objects[request.match_info['bucket']]
+
+        if request.method == 'HEAD':
+            return web.Response()
+
+        if request.method == 'GET' and request.query.get('list-type') == '2':
+            prefix = request.query.get('prefix', '')
+            after = request.query.get('continuation-token', '')
+            keys = sorted(x for x in objects if x.startswith(prefix) and x > after)
+            page = keys[:self.s3_list_page_size]
+
+            contents = ''.join(f'<Contents><Key>{escape(key)}</Key>'
+                               f'<LastModified>{objects[key][1].strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]}Z</LastModified>'
+                               f'<Size>{objects[key][0]}</Size></Contents>' for key in page)
+            truncated = len(keys) > len(page)
+            token = f'<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>' if truncated else ''
+            return web.Response(text=f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="{S3_XML_NAMESPACE}">'
+                                     f'<KeyCount>{len(page)}</KeyCount><IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                                     f'{contents}{token}</ListBucketResult>', content_type='application/xml')
+
+        if request.method == 'POST' and 'delete' in request.query:
+            # DeleteObjects без Content-MD5 S3 не принимает
+            if request.headers.get('Content-MD5') != base64.b64encode(hashlib.md5(body).digest()).decode():
+                return _s3_error(400, 'BadDigest')
+
+            keys = [x.text for x in ElementTree.fromstring(body).iterfind('{*}Object/{*}Key')]
+            if len(keys) > 1000:
+                return _s3_error(400, 'MalformedXML')
+            for key in keys:
+                objects.pop(key, None)
+            return web.Response(text=f'<?xml version="1.0" encoding="UTF-8"?><DeleteResult xmlns="{S3_XML_NAMESPACE}"/>',
+                                content_type='application/xml')
+
+        return _s3_error(501, 'NotImplemented')
+
+    async def _handle_yandex(self, request: web.Request) -> web.Response:
+        """API пересказа: возвращает ссылку на страницу с пересказом"""
+        await self._delay('yandex')
+        body = await request.json()
+        share_id = uuid.uuid5(uuid.NAMESPACE_URL, body['article_url']).hex
+        return web.json_response({'status': 'success', 'sharing_url': f'{self.base_url}/yandex/share/{share_id}'})
+
+    async def _handle_yandex_share(self, request: web.Request) -> web.Response:
+        """Страница с пересказом"""
+        await self._delay('pages')
+        share_id = request.match_info['id']
+        return web.Response(text=_page(f'Статья {share_id[:8]} - Пересказ YandexGPT',
+                                       '• Первый тезис\n• Второй тезис\n• Третий тезис'), content_type='text/html')
+
+    async def _handle_article(self, request: web.Request) -> web.Response:
+        """Страница материала, на которую ведёт пересланная ссылка"""
+        await self._delay('pages')
+        article_id = request.match_info['id']
+        return web.Response(text=_page(f'Заголовок статьи {article_id}', f'Описание статьи {article_id}'), content_type='text/html')
+
+
+def _check_s3_signature(request: web.Request, body: bytes | None) -> str | None:
+    """
+    Проверка подписи AWS Signature V4 (независимо от клиента: канонический запрос собирается из полученного запроса)
+    :param request: запрос
+    :param body: тело запроса (None - тело читается потоково и должно быть подписано как UNSIGNED-PAYLOAD)
+    :return: код ошибки S3 или None, если подпись верна
+    """
+    match = re.fullmatch(r'AWS4-HMAC-SHA256 Credential=([^/]+)/(\d{8})/([^/]+)/s3/aws4_request, SignedHeaders=([^,]+), Signature=([0-9a-f]{64})',
+                         request.headers.get('Authorization', ''))
+    if match is None:
+        return 'AccessDenied'
+    access_key, date, region, signed_names, signature = match.groups()
+    if access_key != S3_ACCESS_KEY:
+        return 'InvalidAccessKeyId'
+
+    payload_hash = request.headers.get('x-amz-content-sha256', '')
+    expected_hash = 'UNSIGNED-PAYLOAD' if body is None else hashlib.sha256(body).hexdigest()
+    if payload_hash != expected_hash:
+        return 'XAmzContentSHA256Mismatch'
+
+    names = signed_names.split(';')
+    if 'host' not in names or 'x-amz-date' not in names:
+        return 'AccessDenied'
+
+    def quote(value: str) -> str:
+        return urllib.parse.quote(value, safe='-_.~')
+
+    canonical_query = '&'.join(sorted(f'{quote(key)}={quote(value)}'
+                                      for key, value in urllib.parse.parse_qsl(request.query_string, keep_blank_values=True)))
+    canonical_headers = ''.join(f'{name}:{" ".join(request.headers.get(name, "").split())}\n' for name in names)
+    canonical_request = '\n'.join([request.method, request.rel_url.raw_path, canonical_query, canonical_headers, signed_names, payload_hash])
+    string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', request.headers['x-amz-date'], f'{date}/{region}/s3/aws4_request',
+                                hashlib.sha256(canonical_request.encode()).hexdigest()])
+
+    key = ('AWS4' + S3_SECRET_KEY).encode()
+    for part in (date, region, 's3', 'aws4_request'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    expected = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    return None if hmac.compare_digest(expected, signature) else 'SignatureDoesNotMatch'
+
+
+def _s3_error(status: int, code: str) -> web.Response:
+    """
+    Ответ S3 с ошибкой
+    :param status: HTTP статус
+    :param code: код ошибки S3
+    :return: ответ
+    """
+    return web.Response(status=status, text=f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>',
+                        content_type='application/xml')
+
+
+def _page(title: str, description: str) -> str:
+    """
+    HTML страница с OpenGraph метаданными и большим телом (читать его целиком не нужно)
+    :param title: заголовок
+    :param description: описание
+    :return: HTML
+    """
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8">'
+            f'<title>{title}</title>'
+            f'<meta property="og:title" content={json.dumps(title, ensure_ascii=False)}>'
+            f'<meta property="og:description" content={json.dumps(description, ensure_ascii=False)}>'
+            '</head><body>' + '<p>Lorem ipsum dolor sit amet</p>' * 2000 + '</body></html>')
+
@@ -0,0 +1,487 @@
+"""
+Нагрузочный тест бота: настоящие обработчики Bot получают синтетические обновления от тысяч одновременных чатов,
+все внешние сервисы (Telegram, Notion, ImageKit или S3, YandexGPT, страницы по ссылкам) - локальные заглушки.
+
+Сценарии (смешиваются по весам):
+    forward    - пересланный пост со ссылкой: название, описание, тип, категория
+    add        - диалог /add: ссылка, название, тип, категория, описание
+    work_note  - /add_work_urg_imp: заголовок, фотография с подписью
+
+Для каждого уровня одновременности выводятся перцентили задержки по шагам (от получения обновления до ответа бота),
+задержка event loop, рост памяти процесса и доля ошибок:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --levels 100,1000,5000 --mix forward=6,add=1,work_note=3
+    python -m benchmarks.load_test --latency notion=0.3,yandex=2 --budget-ms 1500
+    python -m benchmarks.load_test --telegram-limits   # с настоящими лимитами Telegram (~30 сообщений в секунду)
+    python -m benchmarks.load_test --image-store s3    # изображения в S3 (подпись SigV4 проверяется заглушкой),
+                                                       # в конце - очистка хранилища через ListObjectsV2 и DeleteObjects
+
+Бот и заглушки работают в одном процессе и одном event loop, поэтому задержка event loop включает и работу заглушек.
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+from telebot import asyncio_helper, types
+
+from Bot import Bot
+from ImageKitImageStore import ImageKitImageStore
+from ImageStore import ImageStore
+from MessageQueue import MessageQueue
+from NotionItem import NotionItem
+from NotionWorkNote import NotionWorkNote
+from Profiler import LoopLagMonitor
+from S3ImageStore import S3ImageStore
+from SearchIndex import SearchIndex
+from benchmarks.fake_services import CATEGORIES, CONTENT_TYPES, S3_ACCESS_KEY, S3_SECRET_KEY, FakeServices
+
+TELEGRAM_TOKEN = '0:load-test'
+"""токен бота (сервер Telegram - заглушка)"""
+
+ADMIN_USERNAME = 'load_test_admin'
+"""администратор бота: от его имени выполняются сценарии /add"""
+
+DEFAULT_LATENCY = {'telegram': 0.02, 'notion': 0.15, 'imagekit': 0.1, 'yandex': 0.8, 'pages': 0.05}
+"""задержка заглушек по умолчанию (секунды), близкая к настоящим API"""
+
+
+class UnexpectedReply(Exception):
+    """Бот ответил не тем сообщением, которое ожидает сценарий"""
+
+
+class ErrorCounter:
+    """
+    Обработчик исключений telebot: считает упавшие обработчики вместо записи в лог
+    """
+
+    errors: Counter
+    """Количество ошибок по типам"""
+
+    def __init__(self):
+        self.errors = Counter()
+
+    def handle(self, exception: Exception) -> bool:
+        self.errors[type(exception).__name__] += 1
+        return True
+
+
+class LevelResult:
+    """
+    Результаты одного уровня одновременности
+    """
+
+    concurrency: int
+    """Количество одновременных чатов"""
+
+    duration: float
+    """Длительность уровня (секунды)"""
+
+    latencies: Dict[str, List[float]]
+    """Задержки ответа по шагам сценариев (секунды)"""
+
+    scenarios: Counter
+    """Количество сценариев: ok / failed"""
+
+    errors: Counter
+    """Ошибки по типам (сценарии и обработчики бота)"""
+
+    loop_lag: List[float]
+    """Задержки event loop (секунды)"""
+
+    rss_before: int
+    """Память процесса до уровня (байт)"""
+
+    rss_after: int
+    """Память процесса после уровня (байт)"""
+
+    chat_state: int
+    """Количество чатов, для которых бот хранит состояние после уровня"""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.duration = 0
+        self.latencies = defaultdict(list)
+        self.scenarios = Counter()
+        self.errors = Counter()
+        self.loop_lag = []
+        self.rss_before = 0
+        self.rss_after = 0
+        self.chat_state = 0
+
+    @property
+    def steps(self) -> int:
+        """Количество выполненных шагов"""
+        return sum(len(x) for x in self.latencies.values())
+
+    @property
+    def error_rate(self) -> float:
+        """Доля упавших сценариев"""
+        total = sum(self.scenarios.values())
+        return self.scenarios['failed'] / total if total else 0
+
+    def to_dict(self) -> dict:
+        """
+        Результаты для сохранения в JSON
+        :return: словарь с перцентилями (мс) и счётчиками
+        """
+        return {
+            'concurrency': self.concurrency,
+            'duration_s': round(self.duration, 3),
+            'steps': self.steps,
+            'error_rate': self.error_rate,
+            'errors': dict(self.errors),
+            'latency_ms': {step: _percentiles(values) for step, values in sorted(self.latencies.items())},
+            'loop_lag_ms': _percentiles(self.loop_lag),
+            'rss_before_mb': round(self.rss_before / 2 ** 20, 1),
+            'rss_after_mb': round(self.rss_after / 2 ** 20, 1),
+            'chat_state': self.chat_state
+        }
+
+
+class LoadTest:
+    """
+    Генератор нагрузки: виртуальные пользователи проходят диалоги с ботом, каждый в своём чате
+    """
+
+    bot: Bot
+    """Тестируемый бот"""
+
+    services: FakeServices
+    """Заглушки внешних сервисов"""
+
+    reply_timeout: float
+    """Сколько ждать ответа бота на один шаг (секунды)"""
+
+    think_time: float
+    """Максимальная пауза пользователя между шагами (секунды, выбирается случайно)"""
+
+    _update_ids: itertools.count
+    """Счётчик ID обновлений"""
+
+    _random: random.Random
+    """Генератор случайных чисел (с фиксированным seed для повторяемости)"""
+
+    _result: LevelResult | None
+    """Результаты текущего уровня"""
+
+    _pending: set
+    """Обрабатываемые обновления (как в поллинге telebot, обработка не блокирует приём)"""
+
+    def __init__(self, bot: Bot, services: FakeServices, reply_timeout: float, think_time: float, seed: int):
+        self.bot = bot
+        self.services = services
+        self.reply_timeout = reply_timeout
+        self.think_time = think_time
+        self._update_ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._result = None
+        self._pending = set()
+
+    async def run_level(self, concurrency: int, mix: Dict[str, int], first_chat_id: int, ramp_seconds: float) -> LevelResult:
+        """
+        Прогон одного уровня: concurrency новых чатов одновременно проходят по одному сценарию
+        :param concurrency: количество чатов
+        :param mix: веса сценариев
+        :param first_chat_id: ID первого чата (чаты разных уровней не пересекаются)
+        :param ramp_seconds: за сколько секунд подключаются все чаты уровня
+        :return: результаты уровня
+        """
+        scenarios = {'forward': self._forward, 'add': self._add, 'work_note': self._work_note}
+        names = self._random.choices(list(mix), weights=list(mix.values()), k=concurrency)
+
+        self._result = result = LevelResult(concurrency)
+        handler_errors = self.bot.bot.exception_handler.errors
+        handler_errors_before = handler_errors.copy()
+
+        gc.collect()
+        result.rss_before = _rss()
+        monitor = LoopLagMonitor()
+        monitor.start()
+        started_at = time.perf_counter()
+
+        await asyncio.gather(*[self._run_user(first_chat_id + i, scenarios[name], ramp_seconds * i / concurrency)
+                               for i, name in enumerate(names)])
+
+        result.duration = time.perf_counter() - started_at
+        result.loop_lag = await monitor.stop()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+
+        gc.collect()
+        result.rss_after = _rss()
+        result.chat_state = len(self.bot.userStep)
+        result.errors.update({f'handler: {name}': count for name, count in (handler_errors - handler_errors_before).items()})
+        return result
+
+    async def _run_user(self, chat_id: int, scenario: Callable[[int], Awaitable[None]], start_delay: float) -> None:
+        """
+        Виртуальный пользователь
+        :param chat_id: ID чата
+        :param scenario: сценарий
+        :param start_delay: задержка подключения (секунды)
+        """
+        await asyncio.sleep(start_delay)
+        try:
+            await self._step(chat_id, 'start', 'Добро пожаловать', text='/start')
+            await scenario(chat_id)
+        except asyncio.TimeoutError:
+            self._result.scenarios['failed'] += 1
+            self._result.errors['timeout'] += 1
+        except UnexpectedReply:
+            self._result.scenarios['failed'] += 1
+            self._result.errors['unexpected reply'] += 1
+        else:
+            self._result.scenarios['ok'] += 1
+        finally:
+            self.services.forget_chat(chat_id)
+
+    async def _forward(self, chat_id: int) -> None:
+        """Пересланный пост со ссылкой"""
+        url = f'{self.services.base_url}/article/{chat_id}'
+        await self._step(chat_id, 'forward.post', 'название материала', text=f'Разбор асинхронного ввода-вывода. Подробности по ссылке\n{url}')
+        await self._step(chat_id, 'forward.name', 'описание материала', text='1')
+        await self._step(chat_id, 'forward.description', 'тип контента', text=Bot.skip_buttons_text)
+        await self._step(chat_id, 'forward.content_type', 'категорию', text=self._random.choice(CONTENT_TYPES))
+        await self._step(chat_id, 'forward.category', 'Элемент добавлен', text=self._random.choice(CATEGORIES))
+
+    async def _add(self, chat_id: int) -> None:
+        """Диалог /add"""
+        await self._step(chat_id, 'add.command', 'ссылку', text='/add', username=ADMIN_USERNAME)
+        await self._step(chat_id, 'add.url', 'название', text=f'{self.services.base_url}/article/{chat_id}', username=ADMIN_USERNAME)
+        await self._step(chat_id, 'add.name', 'тип контента', text=f'Материал {chat_id}', username=ADMIN_USERNAME)
+        await self._step(chat_id, 'add.content_type', 'категорию', text=self._random.choice(CONTENT_TYPES), username=ADMIN_USERNAME)
+        await self._step(chat_id, 'add.category', 'описание', text=self._random.choice(CATEGORIES), username=ADMIN_USERNAME)
+        await self._step(chat_id, 'add.description', 'Элемент добавлен', text='Описание из нагрузочного теста', username=ADMIN_USERNAME)
+
+    async def _work_note(self, chat_id: int) -> None:
+        """Рабочая заметка с фотографией"""
+        await self._step(chat_id, 'work_note.command', 'заголовок', text='/add_work_urg_imp')
+        await self._step(chat_id, 'work_note.name', 'описание задачи', text=f'Задача {chat_id}')
+        await self._step(chat_id, 'work_note.photo', 'Задача добавлена', caption='Скриншот ошибки',
+                         photo=[{'file_id': f'photo-{chat_id}', 'file_unique_id': f'photo-{chat_id}', 'width': 1280, 'height': 720}])
+
+    async def _step(self, chat_id: int, name: str, expected: str, username: str | None = None, **message) -> None:
+        """
+        Один шаг диалога: отправить сообщение и дождаться ответа бота
+        :param chat_id: ID чата
+        :param name: название шага (для статистики)
+        :param expected: фрагмент ожидаемого ответа
+        :param username: имя пользователя (по умолчанию - обычный пользователь)
+        :param message: поля сообщения (text, caption, photo)
+        :raises asyncio.TimeoutError: если бот не ответил
+        :raises UnexpectedReply: если ответ не содержит ожидаемый фрагмент
+        """
+        if self.think_time > 0:
+            await asyncio.sleep(self._random.uniform(0, self.think_time))
+
+        update = types.Update.de_json({
+            'update_id': next(self._update_ids),
+            'message': {
+                'message_id': next(self._update_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load', 'username': username or f'user{chat_id}'},
+                **message
+            }
+        })
+
+        started_at = time.perf_counter()
+        task = asyncio.create_task(self.bot.bot.process_new_updates([update]))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+        reply = await self.services.next_reply(chat_id, self.reply_timeout)
+        self._result.latencies[name].append(reply['received_at'] - started_at)
+
+        if expected not in reply['text']:
+            raise UnexpectedReply(f'{name}: {reply["text"][:80]!r}')
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    Перцентили в миллисекундах
+    :param values: значения (секунды)
+    :return: p50, p95, p99, max
+    """
+    if not values:
+        return {}
+    if len(values) == 1:
+        return {key: round(values[0] * 1000, 1) for key in ('p50', 'p95', 'p99', 'max')}
+
+    quantiles = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': round(quantiles[49] * 1000, 1), 'p95': round(quantiles[94] * 1000, 1),
+            'p99': round(quantiles[98] * 1000, 1), 'max': round(max(values) * 1000, 1)}
+
+
+def _rss() -> int:
+    """
+    Текущий размер резидентной памяти процесса
+    :return: байт (на системах без /proc - максимальный размер за время работы)
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _parse_pairs(value: str, cast: Callable) -> dict:
+    """
+    Разбор аргумента вида key=value,key=value
+    :param value: строка аргумента
+    :param cast: тип значения
+    :return: словарь
+    """
+    return {key.strip(): cast(item) for key, item in (pair.split('=', 1) for pair in value.split(',') if pair)}
+
+
+def report(result: LevelResult) -> None:
+    """
+    Вывод результатов уровня
+    :param result: результаты уровня
+    """
+    data = result.to_dict()
+    print(f'\n=== {result.concurrency} chats: {result.steps} steps in {result.duration:.1f} s '
+          f'({result.steps / result.duration:.0f} steps/s), failed scenarios {result.error_rate:.1%}')
+    print(f'{"step":<22}{"n":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}  (ms)')
+    for step, values in sorted(result.latencies.items()):
+        p = data['latency_ms'][step]
+        print(f'{step:<22}{len(values):>7}{p["p50"]:>9.0f}{p["p95"]:>9.0f}{p["p99"]:>9.0f}{p["max"]:>9.0f}')
+
+    lag = data['loop_lag_ms']
+    if lag:
+        print(f'event loop lag: p50 {lag["p50"]:.1f} ms, p99 {lag["p99"]:.1f} ms, max {lag["max"]:.1f} ms')
+    print(f'memory: {data["rss_after_mb"]:.1f} MB ({data["rss_after_mb"] - data["rss_before_mb"]:+.1f} MB), '
+          f'per-chat state kept for {result.chat_state} chats')
+    if result.errors:
+        print('errors: ' + ', '.join(f'{name}: {count}' for name, count in result.errors.most_common()))
+
+
+async def run(args: argparse.Namespace) -> List[LevelResult]:
+    """
+    Запуск заглушек и бота, прогон уровней
+    :param args: аргументы командной строки
+    :return: результаты уровней
+    """
+    services = FakeServices({**DEFAULT_LATENCY, **_parse_pairs(args.latency, float)}, image_size=args.image_kb * 1024)
+    base_url = await services.start()
+
+    # все внешние адреса - на заглушки
+    asyncio_helper.API_URL = base_url + '/bot{0}/{1}'
+    asyncio_helper.FILE_URL = base_url + '/file/bot{0}/{1}'
+    NotionItem.notion_base_url = base_url
+
+    image_store = create_image_store(args.image_store, base_url)
+    work_notes = NotionWorkNote('notion', 'work-notes', image_store, base_url=base_url)
+
+    bot = Bot(TELEGRAM_TOKEN, 'notion', 'materials', ADMIN_USERNAME, 'yandex', work_notes,
+              SearchIndex('notion', 'materials', ':memory:'), enrichment_budget_ms=args.budget_ms,
+              max_concurrent_updates=args.max_concurrent_updates)
+    bot.yandex_endpoint = base_url + '/yandex/sharing-url'
+    bot.bot.exception_handler = ErrorCounter()
+    if not args.telegram_limits:
+        # измеряется сам бот, а не лимиты Telegram
+        bot.outgoing = MessageQueue(bot.bot, global_rate=1e6, chat_rate=1e6, chat_burst=1e6)
+
+    load_test = LoadTest(bot, services, args.reply_timeout, args.think_time, args.seed)
+    mix = _parse_pairs(args.mix, int)
+    results = []
+    first_chat_id = 1_000_000
+
+    try:
+        for concurrency in (int(x) for x in args.levels.split(',')):
+            result = await load_test.run_level(concurrency, mix, first_chat_id, args.ramp_seconds)
+            first_chat_id += concurrency
+            results.append(result)
+            report(result)
+
+            if result.error_rate > args.max_error_rate:
+                print(f'\nДоля ошибок {result.error_rate:.1%} превышает {args.max_error_rate:.1%}, нагрузка дальше не повышается')
+                break
+
+        if args.image_store == 's3':
+            await check_image_cleanup(image_store, services)
+    finally:
+        await bot.drain()
+        await image_store.close()
+        await services.stop()
+
+    print(f'\nзапросы к заглушкам: {services.stats()}, загружено изображений: {services.uploaded_bytes / 2 ** 20:.1f} MB')
+    return results
+
+
+def create_image_store(backend: str, base_url: str) -> ImageStore:
+    """
+    Хранилище изображений, направленное на заглушку
+    :param backend: imagekit или s3
+    :param base_url: адрес заглушек
+    :return: хранилище изображений
+    """
+    match backend:
+        case 'imagekit':
+            image_store = ImageKitImageStore('private', 'public', base_url + '/images')
+            image_store.upload_endpoint = base_url + '/imagekit/upload'
+            return image_store
+        case 's3':
+            return S3ImageStore(base_url + '/s3', 'images', S3_ACCESS_KEY, S3_SECRET_KEY)
+        case _:
+            raise ValueError(f'Неизвестное хранилище изображений: {backend}')
+
+
+async def check_image_cleanup(image_store: ImageStore, services: FakeServices) -> None:
+    """
+    Очистка хранилища после прогона: все загруженные изображения должны быть найдены и удалены пакетами
+    :param image_store: хранилище изображений
+    :param services: заглушки
+    :raises RuntimeError: если после очистки в хранилище остались изображения
+    """
+    stored = sum(len(x) for x in services.s3_objects.values())
+    deleted = await image_store.delete_outdated_images(0)
+    left = sum(len(x) for x in services.s3_objects.values())
+
+    print(f'\nочистка хранилища: найдено и удалено {deleted} из {stored} изображений, осталось {left}')
+    if deleted != stored or left:
+        raise RuntimeError('Очистка хранилища удалила не все изображения')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест бота на локальных заглушках внешних сервисов')
+    parser.add_argument('--levels', default='100,500,1000,2000', help='уровни одновременности через запятую')
+    parser.add_argument('--mix', default='forward=5,add=2,work_note=3', help='веса сценариев')
+    parser.add_argument('--latency', default='', help='задержка заглушек, например notion=0.3,yandex=2 (секунды)')
+    parser.add_argument('--budget-ms', type=int, default=1500, help='сколько бот ждёт пересказ YandexGPT (мс)')
+    parser.add_argument('--max-concurrent-updates', type=int, default=100, help='сколько обновлений разных чатов бот обрабатывает одновременно')
+    parser.add_argument('--image-store', choices=['imagekit', 's3'], default='imagekit', help='заглушка хранилища изображений')
+    parser.add_argument('--image-kb', type=int, default=256, help='размер фотографии в сценарии work_note (КБ)')
+    parser.add_argument('--ramp-seconds', type=float, default=1, help='за сколько секунд подключаются все чаты уровня')
+    parser.add_argument('--think-time', type=float, default=0.2, help='максимальная пауза пользователя между шагами (секунды)')
+    parser.add_argument('--reply-timeout', type=float, default=60, help='сколько ждать ответа бота на шаг (секунды)')
+    parser.add_argument('--max-error-rate', type=float, default=0.2, help='остановить повышение нагрузки при такой доле ошибок')
+    parser.add_argument('--telegram-limits', action='store_true', help='отправлять ответы с настоящими лимитами Telegram')
+    parser.add_argument('--seed', type=int, default=1, help='seed генератора случайных чисел')
+    parser.add_argument('--json', default=None, help='сохранить результаты в файл')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    results = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump([x.to_dict() for x in results], file, ensure_ascii=False, indent=2)
+
+    return 0 if results and results[-1].error_rate <= args.max_error_rate else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
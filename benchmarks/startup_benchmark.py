@@ -0,0 +1,112 @@
+"""
+Бенчмарк холодного старта бота
+
+Импорт (всегда):
+    python -m benchmarks.startup_benchmark
+
+Время до готовности отвечать после перезапуска (нужны настоящие переменные окружения бота):
+    python -m benchmarks.startup_benchmark --full --budget-ms 3000
+
+Каждый замер выполняется в новом процессе, чтобы учитывать стоимость импортов так же, как при перезапуске контейнера.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READY_MARKER = 'Бот готов к работе'
+"""строка, которую бот печатает после завершения прогрева"""
+
+IMPORT_SNIPPET = '''
+import time
+started_at = time.perf_counter()
+import main
+from Bot import Bot
+from NotionWorkNote import NotionWorkNote
+from ImageKitImageStore import ImageKitImageStore
+from SearchIndex import SearchIndex
+image_store = ImageKitImageStore('private', 'public', 'https://example.com')
+Bot('0:token', 'notion', 'database', 'admin', 'yandex', NotionWorkNote('notion', 'database', image_store),
+    SearchIndex('notion', 'database', ':memory:'))
+print((time.perf_counter() - started_at) * 1000)
+'''
+
+
+def measure_import(runs: int) -> list[float]:
+    """
+    Замер времени импорта модулей и создания бота (без сети)
+    :param runs: количество запусков
+    :return: время каждого запуска (мс)
+    """
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, capture_output=True, text=True, check=True)
+        results.append(float(output.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def measure_ready(runs: int, timeout: float) -> list[float]:
+    """
+    Замер времени от запуска процесса до готовности бота (поллинг запущен, соединения и схема прогреты)
+    :param runs: количество запусков
+    :param timeout: максимальное время ожидания одного запуска (секунды)
+    :return: время каждого запуска (мс)
+    """
+    results = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-u', 'main.py'], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        try:
+            deadline = started_at + timeout
+            for line in process.stdout:
+                if READY_MARKER in line:
+                    results.append((time.perf_counter() - started_at) * 1000)
+                    break
+                if time.perf_counter() > deadline:
+                    raise TimeoutError('Бот не вышел на готовность за отведённое время')
+            else:
+                raise RuntimeError(f'Бот завершился с кодом {process.wait()} до готовности')
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+def report(name: str, results: list[float]) -> None:
+    """
+    Вывод статистики замеров
+    :param name: название замера
+    :param results: время запусков (мс)
+    """
+    print(f'{name}: median {statistics.median(results):.0f} ms, min {min(results):.0f} ms, max {max(results):.0f} ms ({len(results)} runs)')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк холодного старта бота')
+    parser.add_argument('--runs', type=int, default=5, help='количество запусков')
+    parser.add_argument('--full', action='store_true', help='запускать main.py и ждать готовности (нужны переменные окружения)')
+    parser.add_argument('--timeout', type=float, default=60, help='таймаут одного запуска в режиме --full (секунды)')
+    parser.add_argument('--budget-ms', type=float, default=None, help='завершиться с ошибкой, если медиана превышает бюджет')
+    args = parser.parse_args()
+
+    import_results = measure_import(args.runs)
+    report('import + construct', import_results)
+    median = statistics.median(import_results)
+
+    if args.full:
+        ready_results = measure_ready(args.runs, args.timeout)
+        report('time to ready', ready_results)
+        median = statistics.median(ready_results)
+
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f'Бюджет {args.budget_ms:.0f} ms превышен')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,15 @@
+import asyncio
 import logging
 import os
-import time
-
-import gevent
 
 from Bot import Bot
-import threading
-import sched
-
+from ImageKitImageStore import ImageKitImageStore
 from ImageStore import ImageStore
+from LocalImageStore import LocalImageStore
 from NotionWorkNote import NotionWorkNote
+from S3ImageStore import S3ImageStore
+from SearchIndex import SearchIndex
+from Supervisor import Supervisor
 
 NOTION_TOKEN = os.getenv('NOTION_TOKEN')
 DATABASE_ID = os.getenv('DATABASE_ID')
@@ -20,9 +20,48 @@ WORK_NOTES_DATABASE_ID = os.getenv('WORK_NOTES_DATABASE_ID')
 IMAGE_KIT_PRIVATE_KEY = os.getenv('IMAGE_KIT_PRIVATE_KEY')
 IMAGE_KIT_PUBLIC_KEY = os.getenv('IMAGE_KIT_PUBLIC_KEY')
 IMAGE_KIT_ENDPOINT = os.getenv('IMAGE_KIT_ENDPOINT')
+IMAGE_STORE_BACKEND = os.getenv('IMAGE_STORE_BACKEND', 'imagekit')
+S3_ENDPOINT = os.getenv('S3_ENDPOINT')
+S3_BUCKET = os.getenv('S3_BUCKET')
+S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY')
+S3_SECRET_KEY = os.getenv('S3_SECRET_KEY')
+S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+S3_PUBLIC_URL = os.getenv('S3_PUBLIC_URL')
+LOCAL_IMAGE_DIR = os.getenv('LOCAL_IMAGE_DIR', 'images')
+LOCAL_IMAGE_PUBLIC_URL = os.getenv('LOCAL_IMAGE_PUBLIC_URL')
+SEARCH_DB_PATH = os.getenv('SEARCH_DB_PATH', 'search_index.db')
+ENRICHMENT_BUDGET_MS = int(os.getenv('ENRICHMENT_BUDGET_MS', '1500'))
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '100'))
+SUPERVISOR_STATE_PATH = os.getenv('SUPERVISOR_STATE_PATH', 'supervisor_state.json')
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8081'))
+
+constants = [NOTION_TOKEN, DATABASE_ID, BOT_TOKEN, ADMIN_USERNAME, YANDEX_TOKEN, WORK_NOTES_DATABASE_ID]
+
+
+IMAGE_CLEANUP_INTERVAL = 24 * 60 * 60
+"""период удаления старых изображений (секунды)"""
 
-constants = [NOTION_TOKEN, DATABASE_ID, BOT_TOKEN, ADMIN_USERNAME, YANDEX_TOKEN, WORK_NOTES_DATABASE_ID, IMAGE_KIT_PRIVATE_KEY, IMAGE_KIT_PUBLIC_KEY,
-             IMAGE_KIT_ENDPOINT]
+IMAGE_MAX_AGE = 3 * 30 * 24 * 60 * 60
+"""сколько хранятся изображения (секунды)"""
+
+
+def create_image_store() -> ImageStore:
+    """
+    Создать хранилище изображений, выбранное переменной IMAGE_STORE_BACKEND (imagekit, s3, local)
+    :return: хранилище изображений
+    :raises ValueError: если хранилище неизвестно или для него не заданы переменные окружения
+    """
+    match IMAGE_STORE_BACKEND:
+        case 'imagekit' if all([IMAGE_KIT_PRIVATE_KEY, IMAGE_KIT_PUBLIC_KEY, IMAGE_KIT_ENDPOINT]):
+            return ImageKitImageStore(IMAGE_KIT_PRIVATE_KEY, IMAGE_KIT_PUBLIC_KEY, IMAGE_KIT_ENDPOINT)
+        case 's3' if all([S3_ENDPOINT, S3_BUCKET, S3_ACCESS_KEY, S3_SECRET_KEY]):
+            return S3ImageStore(S3_ENDPOINT, S3_BUCKET, S3_ACCESS_KEY, S3_SECRET_KEY, S3_REGION, S3_PUBLIC_URL)
+        case 'local' if LOCAL_IMAGE_PUBLIC_URL:
+            return LocalImageStore(LOCAL_IMAGE_DIR, LOCAL_IMAGE_PUBLIC_URL)
+        case 'imagekit' | 's3' | 'local':
+            raise ValueError(f'Переменные окружения хранилища изображений {IMAGE_STORE_BACKEND} не заданы')
+        case _:
+            raise ValueError(f'Неизвестное хранилище изображений: {IMAGE_STORE_BACKEND}')
 
 
 def main():
@@ -30,29 +69,52 @@ def main():
         logging.log(logging.ERROR, 'Переменные окружения не заданы')
         return
 
-    image_store = ImageStore(IMAGE_KIT_PRIVATE_KEY, IMAGE_KIT_PUBLIC_KEY, IMAGE_KIT_ENDPOINT)
+    try:
+        image_store = create_image_store()
+    except ValueError as e:
+        logging.log(logging.ERROR, e)
+        return
+
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    asyncio.run(run(image_store))
+
+
+async def run(image_store: ImageStore) -> None:
+    """
+    Запуск всех задач процесса под управлением супервизора
+    :param image_store: хранилище изображений
+    :return: None
+    """
     notion_work_note_client = NotionWorkNote(NOTION_TOKEN, WORK_NOTES_DATABASE_ID, image_store)
 
-    bot = Bot(BOT_TOKEN, NOTION_TOKEN, DATABASE_ID, ADMIN_USERNAME, YANDEX_TOKEN, notion_work_note_client)
-    bot_thread = threading.Thread(target=bot.run)
-    bot_thread.start()
+    search_index = SearchIndex(NOTION_TOKEN, DATABASE_ID, SEARCH_DB_PATH)
+
+    bot = Bot(BOT_TOKEN, NOTION_TOKEN, DATABASE_ID, ADMIN_USERNAME, YANDEX_TOKEN, notion_work_note_client, search_index,
+              ENRICHMENT_BUDGET_MS, MAX_CONCURRENT_UPDATES)
 
-    scheduler = sched.scheduler(time.time, gevent.sleep)
-    scheduler.enter(3 * 30 * 24 * 60 * 60, 1, periodic_task, (scheduler, image_store))
-    scheduler.run()
+    supervisor = Supervisor(SUPERVISOR_STATE_PATH, HEALTH_PORT)
+    bot.register(supervisor)
+    image_store.register(supervisor)
+    supervisor.add_job('delete_outdated_images', IMAGE_CLEANUP_INTERVAL, lambda: periodic_task(image_store))
 
+    await supervisor.run()
+    await image_store.close()
 
-def periodic_task(scheduler: sched.scheduler, image_store: ImageStore) -> None:
+
+async def periodic_task(image_store: ImageStore) -> None:
     """
     Периодическая задача по удалению старых изображений
-    :param scheduler: объект расписания
     :param image_store: объект хранения изображений
     :return: None
     """
-    image_store.delete_outdated_images()
-    print('Удалены старые изображения')
-
-    scheduler.enter(3 * 30 * 24 * 60 * 60, 1, periodic_task, (scheduler, image_store))
+    deleted = await image_store.delete_outdated_images(IMAGE_MAX_AGE)
+    print(f'Удалены старые изображения: {deleted}')
 
 
 if __name__ == '__main__':